@@ -1,21 +1,73 @@
+import os
+import weakref
+import click
 from flask import Flask # Import the Flask class from the flask module
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_cors import CORS # Import CORS to allow Cross Origin Resource Sharing
 from config import Config
+from .routing import RoutingSession
 
-# Create an instance of Flask called app which will be the central object
-app = Flask(__name__)
-# Set the configuration for the app
-app.config.from_object(Config)
+# Create an instance of SQLAlchemy called db which be the cental object for our database;
+# its sessions send read-only requests to the replicas when any are configured.
+# create_app() binds it to each app it builds.
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
-# Allow Cross Origin Resource Sharing for all domains on all routes
-CORS(app)
 
-# Create an instance of SQLAlchemy called db which be the cental object for our database
-db = SQLAlchemy(app)
-# Create an instance of Migrate with the app and db
-migrate = Migrate(app, db)
+def create_app(config_class=Config):
+    """Build the Flask app.
 
-# import the routes to the app and also the models
-from . import routes, models
+    ``flask --app app`` finds this factory on its own, as does ``gunicorn``
+    through gunicorn.conf.py. Importing the package does no
+    work, and Alembic and the command modules are only loaded for the
+    ``flask`` command line; tests/test_startup.py holds it to that.
+    """
+    # Create an instance of Flask called app which will be the central object
+    app = Flask(__name__)
+    # Set the configuration for the app
+    app.config.from_object(config_class)
+
+    # Allow Cross Origin Resource Sharing for all domains on all routes
+    # and let browsers read the pagination Link header
+    from flask_cors import CORS
+    CORS(app, expose_headers=['Link'])
+
+    db.init_app(app)
+
+    # Instrumentation goes first so its hooks wrap everything registered after it
+    from . import instrumentation, routing, ratelimit, uploads, unit_of_work, routes
+    instrumentation.init_app(app)
+    routing.init_app(app)
+    ratelimit.init_app(app)
+    uploads.init_app(app)
+    unit_of_work.init_app(app)
+    app.register_blueprint(routes.api)
+
+    # Only the `flask` command line needs its commands and Migrate, and Alembic is the slowest import of the app
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        from . import export, importer, purge
+        Migrate(app, db)
+        app.cli.add_command(export.export_command)
+        app.cli.add_command(importer.import_command)
+        app.cli.add_command(purge.purge_orphans_command)
+
+    _apps.add(app)
+    return app
+
+
+def dispose_pools(app):
+    """Drop ``app``'s pooled connections and workers without closing them, as a freshly forked worker must.
+
+    The parent keeps using its connections; the child opens its own on first use,
+    and starts its own password hashing and image variant workers.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    app.extensions.pop('password_hasher', None)
+    app.extensions.pop('image_variants', None)
+
+
+# Workers forked from a preloaded app must not share the parent's pools. The handler is
+# registered once, and only weakly refers to the apps built since.
+_apps = weakref.WeakSet()
+os.register_at_fork(after_in_child=lambda: [dispose_pools(app) for app in list(_apps)])
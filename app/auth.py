@@ -1,7 +1,12 @@
 from flask_httpauth import HTTPBasicAuth, HTTPTokenAuth
 from . import db
 from .models import User
+from .cache import get_token_cache
+from .response_cache import get_versions
 from sqlalchemy import select
+from flask import request
+from .ratelimit import limit, WRITE_METHODS
+from .routing import primary
 
 
 basic_auth = HTTPBasicAuth()
@@ -10,8 +15,15 @@ token_auth = HTTPTokenAuth()
 
 @basic_auth.verify_password
 def verify(email, password):
-    user = db.session.execute(select(User).where(User.email == email)).scalar_one_or_none()
+    # Throttle guesses before paying for the lookup and the hash
+    limit('login_ip', request.remote_addr)
+    limit('login_account', (email or '').lower())
+    # Basic auth only guards /login, which returns the full user, so load its relationships up front
+    user = db.session.execute(select(User).where(User.email == email).options(*User.loader_options())).scalar_one_or_none()
     if user is not None and user.check_password(password):
+        # Upgrade hashes made with older parameters while we have the plaintext
+        if user.password_needs_rehash():
+            user.set_password(password)
         return user
     return None
 
@@ -22,11 +34,26 @@ def handle_error(status_code):
 
 @token_auth.verify_token
 def verify(token):
-    user = db.session.execute(select(User).where(User.token==token)).scalar_one_or_none()
-    # if user is not None and user.token_expiration > datetime.now(timezone.utc):
-    if user is not None:
-        return user
-    return None
+    # Every committed write to a user, in any worker on this host, bumps the user table's
+    # version, so a snapshot cached before it is not used again
+    version = get_versions().get(('user',))
+    entry = get_token_cache().get(token)
+    if entry is not None and entry[0] == version:
+        user = User.from_snapshot(entry[1])
+    else:
+        # Tokens are rotated by writes, so look them up where they were written
+        with primary():
+            user = db.session.execute(select(User).where(User.token==token)).scalar_one_or_none()
+        if user is None:
+            get_token_cache().delete(token)
+            return None
+        get_token_cache().set(token, (version, user.cache_snapshot()))
+    if user.token_expired():
+        get_token_cache().delete(token)
+        return None
+    if request.method in WRITE_METHODS:
+        limit('write_account', user.user_id)
+    return user
 
 @token_auth.error_handler
 def handle_error(status_code):
@@ -0,0 +1,95 @@
+from flask import request, current_app
+from werkzeug.test import EnvironBuilder
+from .ratelimit import limit_writes_by_ip
+from .unit_of_work import Savepoint
+
+
+MAX_BATCH_REQUESTS = 100
+BATCH_METHODS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE'}
+# Endpoints whose responses are open-ended streams, or which would nest a batch
+UNBATCHABLE_PATHS = {'/events', '/export', '/batch'}
+
+
+def dispatch(method, path, body, headers):
+    """Run one sub-request through the routing and error handling of a normal request.
+
+    It shares the outer request's app context, so its writes join the outer
+    unit of work, and before/after request hooks (instrumentation, the commit)
+    run once for the whole batch rather than per sub-request. The per-IP write
+    limit is the exception: each write is charged as if it had been sent alone.
+    A streamed response (``?stream=true`` lists) is closed unread and answered
+    with a 400, since its body would have to be buffered whole.
+    """
+    builder = EnvironBuilder(path=path, method=method, json=body, headers=headers,
+                             environ_base={'REMOTE_ADDR': request.remote_addr})
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    app = current_app._get_current_object()
+    with app.request_context(environ):
+        try:
+            limit_writes_by_ip()
+            rv = app.dispatch_request()
+        except Exception as error:
+            try:
+                rv = app.handle_user_exception(error)
+            except Exception:
+                app.logger.exception('Batch operation %s %s failed', method, path)
+                return 500, {'error': 'Internal server error'}
+        response = app.make_response(rv)
+        if response.is_streamed:
+            response.close()
+            return 400, {'error': 'Streaming responses cannot be batched'}
+        return response.status_code, response.get_json(silent=True) if response.is_json else response.get_data(as_text=True)
+
+
+def run_batch():
+    """Execute a JSON ``{"requests": [...], "atomic": bool}`` batch in one round trip.
+
+    Each request is ``{"method", "path", "body", "headers"}`` and is answered with
+    ``{"status", "body"}`` in the order sent. Sub-requests reuse the batch's
+    Authorization header, which the token cache then resolves without a query.
+    By default every operation stands alone: a failed one is rolled back to a
+    savepoint and the rest still commit. With ``"atomic": true`` the first
+    failure stops the batch and rolls every operation back.
+    """
+    if not request.is_json:
+        return {'error': 'Your content-type must be application/json'}, 400
+    data = request.json
+    operations = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(operations, list):
+        return {'error': 'The request body must be an object with a requests array'}, 400
+    if len(operations) > MAX_BATCH_REQUESTS:
+        return {'error': f'No more than {MAX_BATCH_REQUESTS} requests can be sent at once'}, 400
+    atomic = bool(data.get('atomic', False))
+
+    results = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            results.append({'status': 400, 'body': {'error': 'Each request must be a JSON object'}})
+        else:
+            method = str(operation.get('method', 'GET')).upper()
+            path = operation.get('path')
+            extra_headers = operation.get('headers') or {}
+            if method not in BATCH_METHODS or not isinstance(path, str) or not path.startswith('/'):
+                results.append({'status': 400, 'body': {'error': 'Each request needs a method and a path starting with /'}})
+            elif not isinstance(extra_headers, dict) or not all(isinstance(value, str) for value in extra_headers.values()):
+                results.append({'status': 400, 'body': {'error': 'headers must be an object of strings'}})
+            elif path.split('?')[0].rstrip('/') in UNBATCHABLE_PATHS:
+                results.append({'status': 400, 'body': {'error': f"{path.split('?')[0]} cannot be batched"}})
+            else:
+                headers = {'Authorization': request.headers.get('Authorization', ''), **extra_headers}
+                savepoint = None if atomic else Savepoint()
+                status, body = dispatch(method, path, operation.get('body'), headers)
+                results.append({'status': status, 'body': body})
+                if savepoint is not None:
+                    savepoint.rollback() if status >= 400 else savepoint.release()
+
+        if atomic and results[-1]['status'] >= 400:
+            # The error status makes the request's unit of work roll everything back
+            for _ in operations[index + 1:]:
+                results.append({'status': 424, 'body': {'error': 'Not run because an earlier request failed'}})
+            return {'error': f'Request {index} failed, so the batch was rolled back', 'results': results}, 400
+
+    return {'results': results}
@@ -0,0 +1,86 @@
+from flask import request
+from sqlalchemy import insert
+from . import db
+from .unit_of_work import commit, on_commit
+from .response_cache import bump_version
+from .sync import record_changes
+from .search import reindex
+from .events import queue_rows
+
+
+MAX_BULK_ITEMS = 1000
+
+
+def _insert(model, key, rows):
+    """Insert ``rows`` with as few INSERTs as the database allows; returns the new objects in order."""
+    if db.session.get_bind().dialect.name != 'sqlite':
+        return db.session.scalars(insert(model).returning(model, sort_by_parameter_order=True), rows).all()
+    # SQLite can only return rows in parameter order one INSERT at a time. It numbers the rows
+    # of a multi-row INSERT in order, though, so sorted new ids line up with ``rows``.
+    row_ids = sorted(db.session.scalars(insert(model.__table__).returning(key), rows))
+    return db.session.scalars(db.select(model).where(key.in_(row_ids)).order_by(key)).all()
+
+
+def bulk_write(model, key, owner):
+    """Create or update many ``model`` rows from a JSON array in one transaction.
+
+    Items carrying ``key`` (e.g. ``dog_id``) update that row, filtered through
+    ``model.allowed_fields``; the rest are created for ``owner`` with a multi-row
+    INSERT, filtered through ``model.creatable_fields``. The response reports a
+    status for every item in the order they were sent.
+    """
+    if not request.is_json:
+        return {'error': 'Your content-type must be application/json'}, 400
+    items = request.json
+    if not isinstance(items, list):
+        return {'error': 'The request body must be a JSON array'}, 400
+    if len(items) > MAX_BULK_ITEMS:
+        return {'error': f'No more than {MAX_BULK_ITEMS} items can be sent at once'}, 400
+
+    results = [None] * len(items)
+    creates = {}
+    updates = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {'status': 400, 'error': 'Each item must be a JSON object'}
+        elif key.key in item:
+            updates.append((index, item))
+        else:
+            fields = {field: value for field, value in item.items() if field in model.creatable_fields}
+            # Rows are inserted in groups that share the same columns so each group is one executemany
+            creates.setdefault(frozenset(fields), []).append((index, fields))
+
+    if updates:
+        query = db.select(model).where(key.in_([item[key.key] for _, item in updates]))
+        if not owner.is_admin:
+            query = query.where(model.user_id == owner.user_id)
+        found = {getattr(obj, key.key): obj for obj in db.session.execute(query).scalars()}
+        for index, item in updates:
+            obj = found.get(item[key.key])
+            if obj is None:
+                results[index] = {'status': 404, 'error': f'{model.__name__} not found'}
+                continue
+            for field, value in item.items():
+                if field in model.allowed_fields:
+                    setattr(obj, field, value)
+            results[index] = (200, obj)
+
+    for group in creates.values():
+        rows = [dict(fields, user_id=owner.user_id) for _, fields in group]
+        created = _insert(model, key, rows)
+        for (index, _), obj in zip(group, created):
+            results[index] = (201, obj)
+        # Multi-row INSERTs skip the flush, so log them for /sync, the search index and /events here
+        row_ids = [getattr(obj, key.key) for obj in created]
+        record_changes(db.session.connection(), model, [(row_id, owner.user_id) for row_id in row_ids])
+        reindex(db.session.connection(), model, row_ids)
+        queue_rows(model, row_ids)
+
+    if updates or creates:
+        commit()
+        on_commit(lambda: bump_version(model.__tablename__))
+
+    return {'results': [
+        result if isinstance(result, dict) else {'status': result[0], 'data': result[1].to_dict()}
+        for result in results
+    ]}
@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from flask import current_app
+
+
+class TTLCache:
+    """A bounded, thread-safe LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def get_token_cache():
+    """The app's map of API tokens to ``(user table version, snapshot of the user's columns)``, so token auth can skip the database."""
+    cache = current_app.extensions.get('token_cache')
+    if cache is None:
+        config = current_app.config
+        cache = current_app.extensions.setdefault('token_cache', TTLCache(config['TOKEN_CACHE_SIZE'], config['TOKEN_CACHE_TTL']))
+    return cache
@@ -0,0 +1,59 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import request, make_response, Response
+from werkzeug.http import is_resource_modified
+from . import db
+
+
+def row_version(key, value):
+    """Version query for the single row of ``key``'s model whose ``key`` equals ``value``."""
+    return db.select(key.class_.updated_at.label('last_modified'), key).where(key == value)
+
+
+def collection_version(column, value):
+    """Version query for every row of ``column``'s model whose ``column`` equals ``value``."""
+    return db.select(db.func.max(column.class_.updated_at), db.func.count()).where(column == value)
+
+
+def conditional(version_query):
+    """Answer GETs with ETag/Last-Modified and short-circuit unchanged resources with 304.
+
+    ``version_query`` is called with the view's arguments and returns a select that
+    yields one cheap row which changes whenever the representation does (timestamps,
+    ids, counts). The view only runs, and loads or serializes anything, when the
+    client's copy is stale.
+
+    Last-Modified is only sent when the row has a ``last_modified`` column, as
+    row_version() queries do. The newest timestamp of a collection stays put when
+    a row is deleted or moves elsewhere, so collections rely on the ETag alone.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            row = db.session.execute(version_query(*args, **kwargs)).one_or_none()
+            if row is None:
+                return view(*args, **kwargs)
+
+            etag = hashlib.sha1(f'{request.full_path}|{tuple(row)!r}'.encode()).hexdigest()
+            last_modified = row._mapping.get('last_modified')
+            if last_modified is not None:
+                last_modified = _as_utc(last_modified)
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
+def _as_utc(value):
+    # SQLite hands timezone-aware columns back as naive UTC datetimes
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
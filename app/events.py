@@ -0,0 +1,249 @@
+import json
+import struct
+import time
+from collections import deque
+from threading import BoundedSemaphore, Condition
+from flask import current_app, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from werkzeug.utils import import_string
+from . import db
+from .models import Dog, Image
+from .shared_memory import SharedMap
+
+
+# The models clients are told about, each with the column naming the client it belongs to
+RECIPIENTS = {
+    Dog: 'user_id',
+    Image: 'client_user_id',
+}
+# An event's type is stored as its position here, so only ever append
+EVENT_TYPES = ['dog', 'image']
+TYPES = {Dog: 'dog', Image: 'image'}
+
+
+class LocalEvents:
+    """Recent events kept in this process only.
+
+    Clients only hear about writes made by the worker serving their stream, so
+    this suits a single-process server or development.
+    """
+
+    def __init__(self, config):
+        self._events = deque(maxlen=config['EVENTS_REPLAY_SIZE'])
+        self._last_id = 0
+        self._changed = Condition()
+
+    def publish(self, events):
+        """Append ``(user_id, type, row_id, deleted)`` events and wake every stream."""
+        with self._changed:
+            for user_id, type_, row_id, deleted in events:
+                self._last_id += 1
+                self._events.append((self._last_id, user_id, type_, row_id, deleted))
+            self._changed.notify_all()
+
+    def last_id(self):
+        return self._last_id
+
+    def since(self, last_id, user_id):
+        """``(events, last id, complete)`` for ``user_id`` after ``last_id``.
+
+        ``complete`` is False when some of the events after ``last_id`` are no
+        longer kept, or ``last_id`` was never handed out.
+        """
+        with self._changed:
+            events = list(self._events)
+            latest = self._last_id
+        complete = last_id <= latest and (not events or last_id >= events[0][0] - 1)
+        return [event for event in events if event[0] > last_id and event[1] == user_id], latest, complete
+
+    def wait(self, last_id, timeout):
+        """Block until an event after ``last_id`` is published or ``timeout`` passes; return the last id."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._last_id > last_id, timeout)
+            return self._last_id
+
+
+class SharedEvents:
+    """Recent events in a memory-mapped ring shared by every worker on the host.
+
+    The file starts with the last event id, followed by EVENTS_REPLAY_SIZE
+    slots; event ``n`` lives in slot ``(n - 1) % size``. Streams poll the last id
+    every EVENTS_POLL_SECONDS, which costs no more than reading eight bytes.
+    """
+
+    HEADER = struct.Struct('Q')
+    SLOT = struct.Struct('QqqB?6x')
+
+    def __init__(self, config):
+        self.slots = config['EVENTS_REPLAY_SIZE']
+        self.poll_seconds = config['EVENTS_POLL_SECONDS']
+        self._shared = SharedMap(config['EVENTS_SHARED_PATH'], self.HEADER.size + self.SLOT.size * self.slots)
+
+    def _offset(self, event_id):
+        return self.HEADER.size + (event_id - 1) % self.slots * self.SLOT.size
+
+    def publish(self, events):
+        with self._shared.locked() as shared:
+            last_id = self.HEADER.unpack_from(shared, 0)[0]
+            for user_id, type_, row_id, deleted in events:
+                last_id += 1
+                offset = self._offset(last_id)
+                # Readers check the id before and after a slot, so clear it while the slot changes
+                self.HEADER.pack_into(shared, offset, 0)
+                self.SLOT.pack_into(shared, offset, 0, user_id, row_id, EVENT_TYPES.index(type_), deleted)
+                self.HEADER.pack_into(shared, offset, last_id)
+            self.HEADER.pack_into(shared, 0, last_id)
+
+    def last_id(self):
+        # Aligned 8-byte reads need no lock
+        return self.HEADER.unpack_from(self._shared.map, 0)[0]
+
+    def since(self, last_id, user_id):
+        latest = self.last_id()
+        complete = last_id <= latest and latest - last_id <= self.slots
+        events = []
+        shared = self._shared.map
+        for event_id in range(max(last_id, latest - self.slots) + 1, latest + 1):
+            offset = self._offset(event_id)
+            slot_id, owner, row_id, type_, deleted = self.SLOT.unpack_from(shared, offset)
+            if slot_id != event_id or self.HEADER.unpack_from(shared, offset)[0] != event_id:
+                # Overwritten by a newer event while we read
+                complete = False
+            elif owner == user_id:
+                events.append((event_id, owner, EVENT_TYPES[type_], row_id, deleted))
+        return events, latest, complete
+
+    def wait(self, last_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            latest = self.last_id()
+            remaining = deadline - time.monotonic()
+            if latest > last_id or remaining <= 0:
+                return latest
+            time.sleep(min(self.poll_seconds, remaining))
+
+
+def get_events():
+    events = current_app.extensions.get('events')
+    if events is None:
+        backend = import_string(current_app.config['EVENTS_BACKEND'])
+        events = current_app.extensions.setdefault('events', backend(current_app.config))
+    return events
+
+
+def queue_events(session, events):
+    """Hold ``(user_id, type, row_id, deleted)`` events until the session's transaction commits.
+
+    Events queued inside a savepoint are dropped if it is rolled back.
+    """
+    events = [event for event in events if event[0] is not None]
+    if events:
+        transaction = session.get_nested_transaction() or session.get_transaction()
+        session.info.setdefault('pending_events', {}).setdefault(transaction, []).extend(events)
+
+
+def queue_rows(model, row_ids):
+    """Queue events for ``model`` rows written without a flush (multi-row INSERTs, Core UPDATEs)."""
+    column = RECIPIENTS.get(model)
+    if column is None or not row_ids:
+        return
+    session = db.session()
+    key = model.__table__.primary_key.columns[0]
+    rows = session.execute(db.select(getattr(model, column), key).where(key.in_(row_ids))).all()
+    queue_events(session, [(user_id, TYPES[model], row_id, False) for user_id, row_id in rows])
+
+
+@event.listens_for(Session, 'after_flush')
+def queue_flushed_events(session, flush_context):
+    events = []
+    for obj in session.new | session.dirty | session.deleted:
+        column = RECIPIENTS.get(type(obj))
+        if column is None:
+            continue
+        type_ = TYPES[type(obj)]
+        row_id = obj.__mapper__.primary_key_from_instance(obj)[0]
+        if obj in session.deleted:
+            events.append((getattr(obj, column), type_, row_id, True))
+            continue
+        if obj in session.dirty:
+            if not session.is_modified(obj, include_collections=False):
+                continue
+            # A row handed to another client is gone as far as the previous one is concerned
+            for previous in db.inspect(obj).attrs[column].history.deleted:
+                events.append((previous, type_, row_id, True))
+        events.append((getattr(obj, column), type_, row_id, False))
+    queue_events(session, events)
+
+
+@event.listens_for(Session, 'after_commit')
+def remember_commit(session):
+    session.info['transaction_committed'] = True
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def publish_committed_events(session, transaction):
+    committed = session.info.pop('transaction_committed', False)
+    events = session.info.get('pending_events', {}).pop(transaction, None)
+    if not events or not committed:
+        return
+    if transaction.parent is not None:
+        # A released savepoint's events wait for the enclosing transaction
+        session.info['pending_events'].setdefault(transaction.parent, []).extend(events)
+    else:
+        get_events().publish(events)
+
+
+def _format(event_id, name, data):
+    return f'id: {event_id}\nevent: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+def stream(events, user_id, last_id, heartbeat_seconds, retry_ms):
+    """Yield the server-sent events of ``user_id``'s dogs and images, from after ``last_id``.
+
+    Runs without an app context so an open stream holds no database connection.
+    A ``reset`` event means some events were missed and the client should
+    refetch what it shows.
+    """
+    yield f'retry: {retry_ms}\n\n'
+    cursor = events.last_id() if last_id is None else last_id
+    sent = time.monotonic()
+    while True:
+        pending, latest, complete = events.since(cursor, user_id)
+        if not complete:
+            yield _format(latest, 'reset', {})
+            sent = time.monotonic()
+        for event_id, _, type_, row_id, deleted in pending:
+            yield _format(event_id, type_, {'type': type_, 'id': row_id, 'deleted': deleted})
+            sent = time.monotonic()
+        cursor = latest
+        if time.monotonic() - sent >= heartbeat_seconds:
+            # A comment line keeps proxies from closing an idle stream and notices closed clients
+            yield ': heartbeat\n\n'
+            sent = time.monotonic()
+        events.wait(cursor, max(0, heartbeat_seconds - (time.monotonic() - sent)))
+
+
+def _stream_slots():
+    slots = current_app.extensions.get('event_streams')
+    if slots is None:
+        slots = current_app.extensions.setdefault('event_streams', BoundedSemaphore(current_app.config['EVENTS_MAX_STREAMS']))
+    return slots
+
+
+def event_stream(user_id, last_id):
+    """The streaming response for /events, or a 503 once this worker has EVENTS_MAX_STREAMS open.
+
+    A stream keeps its worker thread until the client leaves, so the server must
+    run threaded workers; see gunicorn.conf.py.
+    """
+    config = current_app.config
+    slots = _stream_slots()
+    if not slots.acquire(blocking=False):
+        retry_after = max(1, config['EVENTS_RETRY_MS'] // 1000)
+        return {'error': 'Too many open event streams, please try again later'}, 503, {'Retry-After': str(retry_after)}
+    body = stream(get_events(), user_id, last_id, config['EVENTS_HEARTBEAT_SECONDS'], config['EVENTS_RETRY_MS'])
+    response = Response(body, mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(slots.release)
+    return response
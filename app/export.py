@@ -0,0 +1,88 @@
+import csv
+import io
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from . import db
+from .models import User, EmergencyContact, Veterinarian, Dog, Image
+from .serializers import model_columns
+
+
+# Rows pulled from the server-side cursor, and written out, at a time
+EXPORT_BATCH_SIZE = 2000
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _dogs_with_owners():
+    # Owner and vet details come from outer joins, so the export is a single pass over dog
+    return (db.select(
+                *model_columns(Dog),
+                User.first_name.label('owner_first_name'),
+                User.last_name.label('owner_last_name'),
+                User.email.label('owner_email'),
+                User.phone_number.label('owner_phone_number'),
+                Veterinarian.name.label('vet_name'),
+                Veterinarian.clinic.label('vet_clinic'),
+                Veterinarian.phone_number.label('vet_phone_number'),
+            )
+            .outerjoin(User, Dog.user_id == User.user_id)
+            .outerjoin(Veterinarian, Dog.vet_id == Veterinarian.vet_id)
+            .order_by(Dog.dog_id))
+
+
+# Each export is a Core select ordered by primary key, built when it is requested
+EXPORTS = {
+    'users': lambda: db.select(*model_columns(User)).order_by(User.user_id),
+    'emergency-contacts': lambda: db.select(*model_columns(EmergencyContact)).order_by(EmergencyContact.ec_id),
+    'veterinarians': lambda: db.select(*model_columns(Veterinarian)).order_by(Veterinarian.vet_id),
+    'dogs': lambda: db.select(*model_columns(Dog)).order_by(Dog.dog_id),
+    'images': lambda: db.select(*model_columns(Image)).order_by(Image.image_id),
+    'dogs-with-owners': _dogs_with_owners,
+}
+
+
+def _ndjson(result):
+    dumps = current_app.json.dumps
+    for rows in result.partitions():
+        yield ''.join(dumps(dict(row)) + '\n' for row in rows)
+
+
+def _csv(result):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(result.keys())
+    for rows in result.partitions():
+        writer.writerows(row.values() for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Empty exports still get their header row
+    yield buffer.getvalue()
+
+
+def export(name, fmt):
+    """Yield the ``name`` export as ``fmt`` text, one batch of rows per chunk.
+
+    Rows are read from a server-side cursor ``EXPORT_BATCH_SIZE`` at a time and
+    nothing else is kept, so memory stays flat whatever the size of the table.
+    Must be consumed inside an app context.
+    """
+    query = EXPORTS[name]().execution_options(yield_per=EXPORT_BATCH_SIZE)
+    result = db.session.execute(query).mappings()
+    writer = _csv if fmt == 'csv' else _ndjson
+    yield from writer(result)
+
+
+@click.command('export')
+@click.argument('name', type=click.Choice(list(EXPORTS)))
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='ndjson', show_default=True)
+@click.option('--output', '-o', type=click.File('w'), default='-', help='File to write to; standard output by default.')
+@with_appcontext
+def export_command(name, fmt, output):
+    """Stream the NAME table (or joined dogs-with-owners) as NDJSON or CSV."""
+    for chunk in export(name, fmt):
+        output.write(chunk)
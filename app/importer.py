@@ -0,0 +1,192 @@
+import csv
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+from . import db
+from .models import User, EmergencyContact, Veterinarian, Dog, Image
+from .passwords import hash_passwords
+from .response_cache import bump_version
+from .sync import record_changes
+from .search import reindex
+from .events import queue_rows
+
+
+IMPORTS = {
+    'users': User,
+    'emergency-contacts': EmergencyContact,
+    'veterinarians': Veterinarian,
+    'dogs': Dog,
+    'images': Image,
+}
+
+
+class InvalidRow(ValueError):
+    """Raised for an input record that cannot be imported; the message names its line."""
+
+
+def importable_fields(model):
+    if model is User:
+        # Imports are run by operators, who may bring admins along
+        return User.allowed_fields | {'password', 'is_admin'}
+    # Other records name their owner either by user_id or by the owner's email
+    return model.creatable_fields | {'user_id', 'owner_email'}
+
+
+def read_records(file, fmt):
+    """Yield ``(line number, record)`` for every record of a CSV or NDJSON file."""
+    if fmt == 'csv':
+        reader = csv.DictReader(file)
+        for record in reader:
+            # CSV has no null, so empty cells mean "not given"
+            yield reader.line_num, {field: value for field, value in record.items() if value != ''}
+        return
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise InvalidRow(f'line {number}: {error}')
+        if not isinstance(record, dict):
+            raise InvalidRow(f'line {number}: each line must be a JSON object')
+        yield number, record
+
+
+def _coerce(column, value):
+    # CSV (and JSON, for timestamps) hands over strings; convert them for the column type
+    if not isinstance(value, str):
+        return value
+    python_type = column.type.python_type
+    if python_type is bool:
+        if value.lower() in ('true', 't', 'yes', '1'):
+            return True
+        if value.lower() in ('false', 'f', 'no', '0'):
+            return False
+        raise ValueError(f'{value!r} is not a boolean')
+    if python_type is int:
+        return int(value)
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return value
+
+
+def validate(model, number, record):
+    """The record's column values, checked against what may be set on a new ``model`` row."""
+    allowed = importable_fields(model)
+    unknown = set(record) - allowed
+    if unknown:
+        raise InvalidRow(f"line {number}: unknown field(s) {', '.join(sorted(unknown))}")
+    columns = model.__table__.c
+    try:
+        return {field: value if field in ('password', 'owner_email') else _coerce(columns[field], value)
+                for field, value in record.items()}
+    except ValueError as error:
+        raise InvalidRow(f'line {number}: {error}')
+
+
+def insert_chunk(model, chunk):
+    """Insert one chunk of ``(line number, row)`` pairs; the caller commits."""
+    rows = [row for _, row in chunk]
+    if model is User:
+        passwords = [(row, row['password']) for row in rows if row.get('password') is not None]
+        for (row, _), hashed in zip(passwords, hash_passwords([password for _, password in passwords])):
+            row['password'] = hashed
+    else:
+        emails = {row['owner_email'] for row in rows if 'owner_email' in row}
+        owners = dict(db.session.execute(db.select(User.email, User.user_id).where(User.email.in_(emails))).all()) if emails else {}
+        for number, row in chunk:
+            if 'owner_email' in row:
+                email = row.pop('owner_email')
+                if email not in owners:
+                    raise InvalidRow(f'line {number}: no user has the email {email}')
+                row['user_id'] = owners[email]
+
+    # Rows sharing the same columns go out as one executemany, leaving column defaults to the rest
+    groups = {}
+    for row in rows:
+        groups.setdefault(frozenset(row), []).append(row)
+    key = model.__table__.primary_key.columns[0]
+    for group in groups.values():
+        inserted = db.session.execute(insert(model.__table__).returning(key, model.user_id), group).all()
+        record_changes(db.session.connection(), model, inserted)
+        reindex(db.session.connection(), model, [row_id for row_id, _ in inserted])
+        queue_rows(model, [row_id for row_id, _ in inserted])
+
+
+def _progress_path(path):
+    return f'{path}.progress'
+
+
+def _read_progress(path, name):
+    try:
+        with open(_progress_path(path)) as file:
+            progress = json.load(file)
+    except FileNotFoundError:
+        return 0
+    if progress['name'] != name:
+        raise click.ClickException(f"{_progress_path(path)} belongs to a {progress['name']} import")
+    return progress['rows']
+
+
+def _write_progress(path, name, rows):
+    staged = _progress_path(path) + '.tmp'
+    with open(staged, 'w') as file:
+        json.dump({'name': name, 'rows': rows}, file)
+    os.replace(staged, _progress_path(path))
+
+
+@click.command('import')
+@click.argument('name', type=click.Choice(list(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--chunk-size', type=click.IntRange(min=1), help='Rows per transaction; IMPORT_CHUNK_SIZE by default.')
+@click.option('--resume', is_flag=True, help='Skip the rows an earlier, failed run already committed.')
+@with_appcontext
+def import_command(name, path, fmt, chunk_size, resume):
+    """Import NAME records from the CSV or NDJSON file at PATH.
+
+    Fields are validated against what the API lets clients set. Rows are
+    inserted in chunks, one transaction each, and the number committed so far is
+    kept next to the file in PATH.progress, so a failed import can be fixed and
+    continued with --resume.
+    """
+    model = IMPORTS[name]
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+    skip = _read_progress(path, name) if resume else 0
+    if skip:
+        click.echo(f'Resuming after the first {skip} rows', err=True)
+
+    done = skip
+    start = time.perf_counter()
+    with open(path, newline='') as file:
+        records = islice(read_records(file, fmt), skip, None)
+        while True:
+            try:
+                chunk = [(number, validate(model, number, record)) for number, record in islice(records, chunk_size)]
+                if not chunk:
+                    break
+                insert_chunk(model, chunk)
+                db.session.commit()
+                bump_version(model.__tablename__)
+            except (InvalidRow, DBAPIError) as error:
+                db.session.rollback()
+                if isinstance(error, DBAPIError):
+                    error = f'rows from line {chunk[0][0]}: {error.orig}'
+                raise click.ClickException(f'{error}\n{done} rows were committed; fix the file and rerun with --resume')
+            done += len(chunk)
+            _write_progress(path, name, done)
+            elapsed = time.perf_counter() - start
+            click.echo(f'{done} rows imported ({(done - skip) / elapsed:.0f} rows/s)', err=True)
+
+    if os.path.exists(_progress_path(path)):
+        os.remove(_progress_path(path))
+    elapsed = time.perf_counter() - start
+    click.echo(f'Imported {done - skip} {name} in {elapsed:.1f}s ({(done - skip) / max(elapsed, 1e-9):.0f} rows/s)', err=True)
@@ -0,0 +1,164 @@
+import time
+from threading import Lock
+from flask import g, request, has_app_context, current_app
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from . import db
+from .cache import get_token_cache
+from .ratelimit import counters as ratelimit_counters
+from .response_cache import get_store as get_response_cache
+
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """A Prometheus-style cumulative histogram, kept per endpoint."""
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, endpoint, value):
+        with self._lock:
+            series = self._series.setdefault(endpoint, {'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for endpoint, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{self.name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{endpoint="{endpoint}"}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{endpoint="{endpoint}"}} {series["count"]}')
+        return lines
+
+
+request_duration = Histogram('luckypaws_request_duration_seconds', 'Total time spent handling a request.', DURATION_BUCKETS)
+db_duration = Histogram('luckypaws_db_duration_seconds', 'Time spent executing SQL per request.', DURATION_BUCKETS)
+pool_wait_duration = Histogram('luckypaws_pool_wait_seconds', 'Time spent waiting for a pooled connection per request.', DURATION_BUCKETS)
+serialization_duration = Histogram('luckypaws_serialization_seconds', 'Time spent encoding JSON per request.', DURATION_BUCKETS)
+queries_per_request = Histogram('luckypaws_queries_per_request', 'Number of SQL statements executed per request.', QUERY_COUNT_BUCKETS)
+histograms = (request_duration, db_duration, pool_wait_duration, serialization_duration, queries_per_request)
+
+
+def _add(name, value):
+    # Timings are collected per app context, which covers requests and background workers alike
+    if has_app_context():
+        g.setdefault('timings', {}).setdefault(name, 0)
+        g.timings[name] += value
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_start'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def finish_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('query_start', time.perf_counter())
+    _add('db', elapsed)
+    _add('queries', 1)
+    threshold = current_app.config['SLOW_QUERY_THRESHOLD_MS'] if has_app_context() else None
+    if threshold is not None and elapsed * 1000 >= threshold:
+        current_app.logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, statement)
+
+
+def time_checkouts(pool):
+    # The pool has no "before checkout" event, so wrap connect() to see how long callers wait
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            _add('pool', time.perf_counter() - start)
+
+    pool.connect = timed_connect
+
+
+@event.listens_for(Engine, 'engine_disposed')
+def retime_checkouts(engine):
+    # dispose() swaps in a fresh pool, which needs wrapping again
+    time_checkouts(engine.pool)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            _add('serialize', time.perf_counter() - start)
+
+
+def start_request():
+    g.request_start = time.perf_counter()
+
+
+def record_request(response):
+    # Registered before every other after_request hook, so it runs last and includes the commit
+    total = time.perf_counter() - g.pop('request_start', time.perf_counter())
+    timings = g.pop('timings', {})
+    queries = timings.get('queries', 0)
+    endpoint = request.endpoint or 'none'
+
+    request_duration.observe(endpoint, total)
+    db_duration.observe(endpoint, timings.get('db', 0))
+    pool_wait_duration.observe(endpoint, timings.get('pool', 0))
+    serialization_duration.observe(endpoint, timings.get('serialize', 0))
+    queries_per_request.observe(endpoint, queries)
+
+    response.headers['Server-Timing'] = ', '.join([
+        f'db;dur={timings.get("db", 0) * 1000:.2f};desc="{queries} queries"',
+        f'pool;dur={timings.get("pool", 0) * 1000:.2f}',
+        f'serialize;dur={timings.get("serialize", 0) * 1000:.2f}',
+        f'total;dur={total * 1000:.2f}',
+    ])
+    return response
+
+
+def init_app(app):
+    app.json = TimedJSONProvider(app)
+    app.before_request(start_request)
+    app.after_request(record_request)
+    with app.app_context():
+        for engine in db.engines.values():
+            time_checkouts(engine.pool)
+
+
+def render_metrics():
+    """Render this worker's metrics in the Prometheus text exposition format."""
+    lines = []
+    for histogram in histograms:
+        lines.extend(histogram.render())
+    for cache_name, cache in (('token_cache', get_token_cache()), ('response_cache', get_response_cache())):
+        stats = cache.stats()
+        for name in ('hits', 'misses'):
+            lines.append(f'# TYPE luckypaws_{cache_name}_{name}_total counter')
+            lines.append(f'luckypaws_{cache_name}_{name}_total {stats[name]}')
+        lines.append(f'# TYPE luckypaws_{cache_name}_size gauge')
+        lines.append(f'luckypaws_{cache_name}_size {stats["size"]}')
+    lines.append('# TYPE luckypaws_db_pool_connections gauge')
+    for bind, engine in db.engines.items():
+        # Only queue pools (any server database, or a SQLite file) keep these counts
+        for state, count in (('size', 'size'), ('idle', 'checkedin'), ('checked_out', 'checkedout'), ('overflow', 'overflow')):
+            if hasattr(engine.pool, count):
+                lines.append(f'luckypaws_db_pool_connections{{bind="{bind or "primary"}",state="{state}"}} {getattr(engine.pool, count)()}')
+    lines.append('# TYPE luckypaws_ratelimit_requests_total counter')
+    for name, counts in sorted(ratelimit_counters().items()):
+        for outcome, count in counts.items():
+            lines.append(f'luckypaws_ratelimit_requests_total{{limit="{name}",outcome="{outcome}"}} {count}')
+    return '\n'.join(lines) + '\n'
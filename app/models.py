@@ -1,9 +1,17 @@
 import secrets
 from . import db
 from datetime import datetime, timezone, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
+from .passwords import hash_password, check_password, needs_rehash
+from flask import current_app
+from sqlalchemy.orm import selectinload, make_transient_to_detached
+from .cache import get_token_cache
+from .unit_of_work import commit, on_commit
+from .response_cache import bump_version
 
 
+def utcnow():
+    return datetime.now(timezone.utc)
+
 
 class User(db.Model):
     user_id = db.Column(db.Integer, primary_key=True)
@@ -14,36 +22,65 @@ class User(db.Model):
     city = db.Column(db.Text)
     state = db.Column(db.Text)
     zip = db.Column(db.Integer)
-    email = db.Column(db.Text)
+    email = db.Column(db.Text, index=True, unique=True)
     phone_number = db.Column(db.Text)
     private_notes = db.Column(db.Text)
     date_created = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     password = db.Column(db.Text)
     is_admin = db.Column(db.Boolean, default=False)
     token = db.Column(db.Text, index=True, unique=True)
-    # token_expiration = db.Column(db.DateTime(timezone=True))
+    token_expiration = db.Column(db.DateTime(timezone=True))
+    # Bumped on every write; drives the ETag/Last-Modified validators
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, onupdate=utcnow)
     emergency_contacts = db.relationship('EmergencyContact', back_populates='user')
     veterinarians = db.relationship('Veterinarian', back_populates='user')
     dogs = db.relationship('Dog', back_populates='user')
     images = db.relationship('Image', back_populates='user')
 
+    allowed_fields = {'first_name', 'last_name', 'street1', 'street2', 'city', 'state', 'zip', 'email', 'phone_number', 'private_notes'}
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.set_password(kwargs.get('password', ''))
 
     def __repr__(self):
         return f"<User {self.user_id}|{self.first_name} {self.last_name}>"
+
+    @classmethod
+    def loader_options(cls, strategy=selectinload):
+        # Eager load every relationship to_dict() walks so a page of users costs
+        # one query per relationship instead of four lazy loads per user
+        return [strategy(rel) for rel in (cls.emergency_contacts, cls.veterinarians, cls.dogs, cls.images)]
+
+    @classmethod
+    def version_query(cls, user_id):
+        # to_dict() embeds the user's related rows, so their counts and newest
+        # updated_at are part of the user's version as well
+        columns = [cls.updated_at]
+        for model in (EmergencyContact, Veterinarian, Dog, Image):
+            owned = model.user_id == cls.user_id
+            columns.append(db.select(db.func.count()).where(owned).scalar_subquery())
+            columns.append(db.select(db.func.max(model.updated_at)).where(owned).scalar_subquery())
+        return db.select(*columns).where(cls.user_id == user_id)
     
     def set_password(self, plaintext_password):
-        self.password = generate_password_hash(plaintext_password)
+        self.password = hash_password(plaintext_password)
         self.save()
 
     def save(self):
         db.session.add(self)
-        db.session.commit()
+        commit()
+        on_commit(lambda: bump_version(self.__tablename__))
+        on_commit(lambda token=self.token: get_token_cache().delete(token))
 
     def check_password(self, plaintext_password):
-        return check_password_hash(self.password, plaintext_password)
+        # Imported users may not have a password until they reset it
+        if self.password is None:
+            return False
+        return check_password(self.password, plaintext_password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password)
     
     def to_dict(self):
         return {
@@ -61,6 +98,8 @@ class User(db.Model):
             "date_created": self.date_created,
             "is_admin": self.is_admin,
             "token": self.token,
+            "token_expiration": self.token_expiration,
+            "updated_at": self.updated_at,
             "emergency_contacts": [ec.to_dict() for ec in self.emergency_contacts],
             "veterinarians": [vet.to_dict() for vet in self.veterinarians],
             "dogs": [dog.to_dict() for dog in self.dogs],
@@ -68,23 +107,54 @@ class User(db.Model):
         }
     
     def get_token(self):
-        # now = datetime.now(timezone.utc)
-        # if self.token and self.token_expiration > now + timedelta(minutes=1):
-        #     return {"token": self.token, "tokenExpiration": self.token_expiration}
-        # self.token = secrets.token_hex(16)
-        # self.token_expiration = now + timedelta(hours=24)
-        # self.save()
-        return {"token": self.token}
+        now = datetime.now(timezone.utc)
+        if self.token and not self.token_expired(now + timedelta(minutes=1)):
+            return {"token": self.token, "tokenExpiration": self.token_expiration}
+        old_token = self.token
+        self.token = secrets.token_hex(16)
+        self.token_expiration = now + timedelta(seconds=current_app.config['TOKEN_LIFETIME'])
+        self.save()
+        on_commit(lambda: get_token_cache().delete(old_token))
+        return {"token": self.token, "tokenExpiration": self.token_expiration}
+
+    def token_expired(self, now=None):
+        # Tokens issued before expirations were tracked have none and must be rotated
+        if self.token_expiration is None:
+            return True
+        expiration = self.token_expiration
+        # SQLite hands timezone-aware columns back as naive UTC datetimes
+        if expiration.tzinfo is None:
+            expiration = expiration.replace(tzinfo=timezone.utc)
+        return expiration <= (now or datetime.now(timezone.utc))
+
+    def cache_snapshot(self):
+        return {attr.key: getattr(self, attr.key) for attr in self.__mapper__.column_attrs}
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        # Rebuild a persistent user from cached column values without a SELECT;
+        # relationships are still lazy loaded on first access. A user this session
+        # already holds (e.g. from an earlier operation of a batch) may have writes
+        # the snapshot predates, so it is used as is
+        user = db.session.identity_map.get(db.session.identity_key(cls, snapshot['user_id']))
+        if user is not None:
+            return user
+        user = cls.__mapper__.class_manager.new_instance()
+        for key, value in snapshot.items():
+            setattr(user, key, value)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
     
     def delete(self):
-        db.session.delete(self)
-        db.session.commit()
+        # Everything the user owns goes with one statement per table; purge imports
+        # these models, hence the late import
+        from .purge import purge_users
+        purge_users([self.user_id])
+        commit()
 
     def update(self, **kwargs):
-        allowed_fields = {'first_name', 'last_name', 'street1', 'street2', 'city', 'state', 'zip', 'email', 'phone_number', 'private_notes', 'is_admin'}
-
         for key, value in kwargs.items():
-            if key in allowed_fields:
+            if key in self.allowed_fields:
                 setattr(self, key, value)
         self.save()
 
@@ -96,9 +166,13 @@ class EmergencyContact(db.Model):
     last_name = db.Column(db.Text)
     phone_number = db.Column(db.Text)
     email = db.Column(db.Text)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'))
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'), index=True)
     user = db.relationship('User', back_populates='emergency_contacts')
 
+    allowed_fields = {'first_name', 'last_name', 'phone_number', 'email'}
+    creatable_fields = allowed_fields
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.save()
@@ -108,17 +182,17 @@ class EmergencyContact(db.Model):
     
     def save(self):
         db.session.add(self)
-        db.session.commit()
+        commit()
+        on_commit(lambda: bump_version(self.__tablename__))
 
     def delete(self):
         db.session.delete(self)
-        db.session.commit()
+        commit()
+        on_commit(lambda: bump_version(self.__tablename__))
 
     def update(self, **kwargs):
-        allowed_fields = {'first_name', 'last_name', 'phone_number', 'email'}
-
         for key, value in kwargs.items():
-            if key in allowed_fields:
+            if key in self.allowed_fields:
                 setattr(self, key, value)
         self.save()
 
@@ -129,7 +203,8 @@ class EmergencyContact(db.Model):
             "last_name": self.last_name,
             "phone_number": self.phone_number,
             "email": self.email,
-            "user_id": self.user_id  
+            "user_id": self.user_id,
+            "updated_at": self.updated_at
         }
 
 
@@ -144,9 +219,13 @@ class Veterinarian(db.Model):
     zip = db.Column(db.Integer)
     email = db.Column(db.Text)
     phone_number = db.Column(db.Text)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'))
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'), index=True)
     user = db.relationship('User', back_populates='veterinarians')
 
+    allowed_fields = {'name', 'clinic', 'street1', 'street2', 'city', 'state', 'zip', 'email', 'phone_number'}
+    creatable_fields = allowed_fields
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.save()
@@ -156,17 +235,17 @@ class Veterinarian(db.Model):
     
     def save(self):
         db.session.add(self)
-        db.session.commit()
+        commit()
+        on_commit(lambda: bump_version(self.__tablename__))
 
     def delete(self):
         db.session.delete(self)
-        db.session.commit()
+        commit()
+        on_commit(lambda: bump_version(self.__tablename__))
 
     def update(self, **kwargs):
-        allowed_fields = {'name', 'clinic', 'street1', 'street2', 'city', 'state', 'zip', 'email', 'phone_number'}
-
         for key, value in kwargs.items():
-            if key in allowed_fields:
+            if key in self.allowed_fields:
                 setattr(self, key, value)
         self.save()
 
@@ -182,7 +261,8 @@ class Veterinarian(db.Model):
             "zip": self.zip,
             "email": self.email,
             "phone_number": self.phone_number,
-            "user_id": self.user_id
+            "user_id": self.user_id,
+            "updated_at": self.updated_at
         }
 
 
@@ -204,10 +284,15 @@ class Dog(db.Model):
     potty_schedule = db.Column(db.Text)
     crated = db.Column(db.Boolean)
     daily_updates = db.Column(db.Boolean)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'))
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'), index=True)
     vet_id = db.Column(db.Integer, db.ForeignKey('veterinarian.vet_id'))
     user = db.relationship('User', back_populates='dogs')
 
+    allowed_fields = {'name', 'breed', 'sex', 'altered', 'health_conditions', 'medications', 'allergies', 'private_notes', 'bn_favorite_activities', 'bn_issues', 'profile_pic_url', 'feeding_schedule', 'potty_schedule', 'crated', 'daily_updates'}
+    # Fields that may only be set when a dog is created
+    creatable_fields = allowed_fields | {'birthday', 'vet_id'}
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.save()
@@ -217,17 +302,18 @@ class Dog(db.Model):
     
     def save(self):
         db.session.add(self)
-        db.session.commit()
+        commit()
+        on_commit(lambda: bump_version(self.__tablename__))
 
     def delete(self):
-        db.session.delete(self)
-        db.session.commit()
+        # Takes the dog's images with it, in one statement per table
+        from .purge import purge_dogs
+        purge_dogs([self.dog_id])
+        commit()
 
     def update(self, **kwargs):
-        allowed_fields = {'name', 'breed', 'sex', 'altered', 'health_conditions', 'medications', 'allergies', 'private_notes', 'bn_favorite_activities', 'bn_issues', 'profile_pic_url', 'feeding_schedule', 'potty_schedule', 'crated', 'daily_updates'}
-
         for key, value in kwargs.items():
-            if key in allowed_fields:
+            if key in self.allowed_fields:
                 setattr(self, key, value)   
         self.save()
 
@@ -251,6 +337,7 @@ class Dog(db.Model):
             "crated": self.crated,
             "daily_updates": self.daily_updates,
             "user_id": self.user_id,
+            "updated_at": self.updated_at
         }
         
 
@@ -261,9 +348,19 @@ class Image(db.Model):
     date_added = db.Column(db.DateTime(timezone=True), default=datetime.now)
     client_user_id = db.Column(db.Integer)
     description = db.Column(db.Text)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'))
-    dog_id = db.Column(db.Integer, db.ForeignKey('dog.dog_id'))
+    # SHA-256 of uploaded files; images sharing it share the stored file and its variants
+    content_hash = db.Column(db.Text, index=True)
+    thumbnail_url = db.Column(db.Text)
+    web_url = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, onupdate=utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'), index=True)
+    dog_id = db.Column(db.Integer, db.ForeignKey('dog.dog_id'), index=True)
     user = db.relationship('User', back_populates='images')
+    # Serves both /images/client/<id> lookups and a client's timeline ordered by date
+    __table_args__ = (db.Index('ix_image_client_user_id_date_added', 'client_user_id', 'date_added'),)
+
+    allowed_fields = {'image_url', 'date_added'}
+    creatable_fields = allowed_fields | {'client_user_id', 'description', 'dog_id'}
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -274,17 +371,17 @@ class Image(db.Model):
     
     def save(self):
         db.session.add(self)
-        db.session.commit()
+        commit()
+        on_commit(lambda: bump_version(self.__tablename__))
 
     def delete(self):
         db.session.delete(self)
-        db.session.commit()
+        commit()
+        on_commit(lambda: bump_version(self.__tablename__))
 
     def update(self, **kwargs):
-        allowed_fields = {'image_url', 'date_added'}
-
         for key, value in kwargs.items():
-            if key in allowed_fields:
+            if key in self.allowed_fields:
                 setattr(self, key, value)
         self.save()
 
@@ -296,5 +393,26 @@ class Image(db.Model):
             "description": self.description,
             "user_id": self.user_id,
             "dog_id": self.dog_id,
-            "date_added": self.date_added
+            "date_added": self.date_added,
+            "content_hash": self.content_hash,
+            "thumbnail_url": self.thumbnail_url,
+            "web_url": self.web_url,
+            "updated_at": self.updated_at
         }
+
+
+class Change(db.Model):
+    """One entry in the append-only log of writes that /sync replays to offline clients."""
+    # Monotonic, so clients can resume from the last sequence number they saw
+    seq = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.Text, nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    # Owner of the changed row, which decides who may sync it
+    user_id = db.Column(db.Integer)
+    # Set for tombstones, which tell clients to drop their copy of the row
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    changed_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow)
+    __table_args__ = (db.Index('ix_change_user_id_seq', 'user_id', 'seq'),)
+
+    def __repr__(self):
+        return f"<Change {self.seq}|{self.table_name} {self.row_id}>"
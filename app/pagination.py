@@ -0,0 +1,66 @@
+from flask import request, current_app, url_for, Response, stream_with_context
+from . import db
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Number of rows pulled from the server-side cursor at a time when streaming
+STREAM_BATCH_SIZE = 500
+
+
+def paginate(query, key, serialize):
+    """Respond with one keyset page of ``query`` ordered by ``key``.
+
+    ``query`` selects plain columns and ``serialize`` turns a list of result
+    mappings into a list of dicts, so no ORM objects are built. ``?limit=`` sets
+    the page size and ``?after=`` is the last key of the previous page; the next
+    page is advertised in a ``Link: <...>; rel="next"`` header so the body stays
+    a plain JSON array. ``?stream=true`` instead streams every matching row from
+    a server-side cursor, keeping memory flat for any table size.
+    """
+    args = request.args
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+        after = int(args['after']) if 'after' in args else None
+    except ValueError:
+        return {'error': 'limit and after must be integers'}, 400
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return {'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}, 400
+
+    query = query.order_by(key)
+    if after is not None:
+        query = query.where(key > after)
+
+    if args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        if 'limit' in args:
+            query = query.limit(limit)
+        return stream_json_array(query, serialize)
+
+    # Fetch one extra row to know whether there is a next page without a COUNT
+    rows = db.session.execute(query.limit(limit + 1)).mappings().all()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+
+    headers = {}
+    if has_next:
+        # Carry the other query parameters (e.g. ?fields=) over to the next page
+        params = {name: value for name, value in args.items() if name not in ('limit', 'after')}
+        next_url = url_for(request.endpoint, **(request.view_args or {}), **params, limit=limit, after=rows[-1][key.key])
+        headers['Link'] = f'<{next_url}>; rel="next"'
+    return serialize(rows), 200, headers
+
+
+def stream_json_array(query, serialize):
+    """Stream the results of ``query`` as a JSON array, serializing one batch of rows at a time."""
+    dumps = current_app.json.dumps
+
+    def generate():
+        result = db.session.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE)).mappings()
+        separator = '['
+        for rows in result.partitions():
+            for item in serialize(rows):
+                yield separator + dumps(item)
+                separator = ','
+        yield '[]' if separator == '[' else ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -0,0 +1,80 @@
+import multiprocessing
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from threading import BoundedSemaphore, Lock
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when the password hashing queue is already full."""
+
+
+_lock = Lock()
+
+
+def _get_pool():
+    # Created on first use; a forked worker drops the parent's pool and starts its own, see dispose_pools()
+    with _lock:
+        hasher = current_app.extensions.get('password_hasher')
+        if hasher is None:
+            pool = None
+            workers = current_app.config['PASSWORD_HASH_WORKERS']
+            if workers:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            hasher = current_app.extensions['password_hasher'] = (
+                pool, BoundedSemaphore(current_app.config['PASSWORD_HASH_QUEUE_LIMIT']))
+    return hasher
+
+
+def _run(function, *args):
+    """Run a CPU-bound hashing function in the pool, failing fast when too much is queued."""
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise HasherBusy()
+    try:
+        if pool is None:
+            return function(*args)
+        return pool.submit(function, *args).result()
+    finally:
+        slots.release()
+
+
+def hash_password(plaintext_password):
+    return _run(generate_password_hash, plaintext_password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def hash_passwords(plaintext_passwords):
+    """Hash a batch of passwords across every pool worker, for CLI jobs rather than requests."""
+    pool, _ = _get_pool()
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    if pool is None:
+        return [generate_password_hash(password, method) for password in plaintext_passwords]
+    # A few tasks per worker keeps them all busy without paying IPC per password
+    chunksize = max(1, len(plaintext_passwords) // (4 * current_app.config['PASSWORD_HASH_WORKERS']))
+    return list(pool.map(generate_password_hash, plaintext_passwords, repeat(method), chunksize=chunksize))
+
+
+def check_password(password_hash, plaintext_password):
+    return _run(check_password_hash, password_hash, plaintext_password)
+
+
+def hash_parameters(method):
+    """``method`` as werkzeug applies it, defaults included, e.g. ``'scrypt'`` -> ``('scrypt', 32768, 8, 1)``."""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        return (name, *(map(int, args) if args else (2**15, 8, 1)))
+    if name == 'pbkdf2':
+        return (name, args[0] if args else 'sha256', int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS)
+    return (name, *args)
+
+
+def needs_rehash(password_hash):
+    """Whether ``password_hash`` was made with different parameters than the configured ones."""
+    try:
+        used = hash_parameters(password_hash.split('$', 1)[0])
+    except ValueError:
+        return True
+    return used != hash_parameters(current_app.config['PASSWORD_HASH_METHOD'])
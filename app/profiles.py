@@ -0,0 +1,71 @@
+from . import db
+from .models import User, EmergencyContact, Veterinarian, Dog, Image
+from .serializers import select_columns
+
+
+# Number of each dog's most recent images a profile embeds
+LATEST_IMAGES_PER_DOG = 5
+
+
+def _profile_vets(user_id):
+    # The client's own vets plus any other vet one of their dogs is registered with
+    dog_vets = db.select(Dog.vet_id).where(Dog.user_id == user_id)
+    return db.or_(Veterinarian.user_id == user_id, Veterinarian.vet_id.in_(dog_vets))
+
+
+def profile_version(user_id):
+    """Version query covering every row ``client_profile`` reads for ``user_id``."""
+    dog_ids = db.select(Dog.dog_id).where(Dog.user_id == user_id)
+    columns = [User.updated_at]
+    for model, included in (
+        (EmergencyContact, EmergencyContact.user_id == user_id),
+        (Veterinarian, _profile_vets(user_id)),
+        (Dog, Dog.user_id == user_id),
+        (Image, Image.dog_id.in_(dog_ids)),
+    ):
+        columns.append(db.select(db.func.count()).where(included).scalar_subquery())
+        columns.append(db.select(db.func.max(model.updated_at)).where(included).scalar_subquery())
+    return db.select(*columns).where(User.user_id == user_id)
+
+
+def client_profile(user_id):
+    """Everything needed to render one client, or None if there is no such user.
+
+    The user, their emergency contacts and vets, and their dogs with each dog's
+    vet and latest images are read with at most five queries, whatever the
+    number of dogs.
+    """
+    user = db.session.execute(select_columns(User).where(User.user_id == user_id)).mappings().one_or_none()
+    if user is None:
+        return None
+    profile = dict(user)
+
+    profile['emergency_contacts'] = [dict(row) for row in db.session.execute(
+        select_columns(EmergencyContact).where(EmergencyContact.user_id == user_id).order_by(EmergencyContact.ec_id)
+    ).mappings()]
+
+    vets = {row['vet_id']: dict(row) for row in db.session.execute(
+        select_columns(Veterinarian).where(_profile_vets(user_id)).order_by(Veterinarian.vet_id)
+    ).mappings()}
+    profile['veterinarians'] = [vet for vet in vets.values() if vet['user_id'] == user_id]
+
+    dogs = {}
+    query = select_columns(Dog).add_columns(Dog.vet_id.label('_vet_id')).where(Dog.user_id == user_id).order_by(Dog.dog_id)
+    for row in db.session.execute(query).mappings():
+        dog = dict(row)
+        dog['veterinarian'] = vets.get(dog.pop('_vet_id'))
+        dog['latest_images'] = []
+        dogs[dog['dog_id']] = dog
+    profile['dogs'] = list(dogs.values())
+
+    if dogs:
+        # Rank each dog's images by recency in SQL so only the newest few are fetched
+        rank = db.func.row_number().over(partition_by=Image.dog_id, order_by=(Image.date_added.desc(), Image.image_id.desc()))
+        ranked = select_columns(Image).add_columns(rank.label('rank')).where(Image.dog_id.in_(list(dogs))).subquery()
+        query = (db.select(*[column for column in ranked.c if column.key != 'rank'])
+                 .where(ranked.c.rank <= LATEST_IMAGES_PER_DOG)
+                 .order_by(ranked.c.dog_id, ranked.c.rank))
+        for row in db.session.execute(query).mappings():
+            dogs[row['dog_id']]['latest_images'].append(dict(row))
+
+    return profile
@@ -0,0 +1,144 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, update
+from . import db
+from .models import User, EmergencyContact, Veterinarian, Dog, Image
+from .cache import get_token_cache
+from .events import queue_events
+from .response_cache import bump_version
+from .search import reindex
+from .sync import record_changes
+from .unit_of_work import on_commit
+
+
+MAX_PURGE_ITEMS = 1000
+
+
+def _delete(model, condition, *columns):
+    """Delete the ``model`` rows matching ``condition`` in one statement, returning ``columns`` of each."""
+    key = model.__table__.primary_key.columns[0]
+    # Rows already loaded into the session are marked deleted as well
+    return db.session.execute(delete(model).where(condition).returning(key, *columns)).all()
+
+
+def _forget(model, rows):
+    """Log deleted ``(row_id, owner user_id)`` rows for /sync and drop their search documents."""
+    connection = db.session.connection()
+    record_changes(connection, model, rows, deleted=True)
+    reindex(connection, model, [row_id for row_id, _ in rows])
+
+
+def _purge_images(condition):
+    images = _delete(Image, condition, Image.user_id, Image.client_user_id)
+    _forget(Image, [(image_id, user_id) for image_id, user_id, _ in images])
+    queue_events(db.session(), [(client_id, 'image', image_id, True) for image_id, _, client_id in images])
+    return len(images)
+
+
+def _purge_dogs(condition):
+    dogs = _delete(Dog, condition, Dog.user_id)
+    _forget(Dog, dogs)
+    queue_events(db.session(), [(user_id, 'dog', dog_id, True) for dog_id, user_id in dogs])
+    return len(dogs)
+
+
+def purge_dogs(dog_ids):
+    """Delete the dogs ``dog_ids`` and their images with one DELETE per table.
+
+    Nothing is loaded first, however many photos a dog has. Each deleted row
+    is logged for /sync, dropped from the search index and announced on
+    /events, as a flushed delete would be. Returns the number of rows deleted
+    per table.
+    """
+    counts = {
+        'image': _purge_images(Image.dog_id.in_(dog_ids)),
+        'dog': _purge_dogs(Dog.dog_id.in_(dog_ids)),
+    }
+    _bump(counts)
+    return counts
+
+
+def purge_users(user_ids):
+    """Delete the users ``user_ids`` and everything they own with one statement per table.
+
+    Their dogs, vets and emergency contacts go, as do the images of their dogs
+    and the images taken for them. Images they uploaded for other clients are
+    kept with no uploader, and other clients' dogs lose a deleted vet.
+    Returns the number of rows deleted per table.
+    """
+    dogs = db.select(Dog.dog_id).where(Dog.user_id.in_(user_ids))
+    vets = db.select(Veterinarian.vet_id).where(Veterinarian.user_id.in_(user_ids))
+    counts = {'image': _purge_images(Image.client_user_id.in_(user_ids) | Image.dog_id.in_(dogs)
+                                     | (Image.user_id.in_(user_ids) & Image.client_user_id.is_(None)))}
+
+    kept = db.session.execute(update(Image).where(Image.user_id.in_(user_ids)).values(user_id=None)
+                              .returning(Image.image_id)).scalars().all()
+    record_changes(db.session.connection(), Image, [(image_id, None) for image_id in kept])
+    db.session.execute(update(Dog).where(Dog.vet_id.in_(vets), Dog.user_id.not_in(user_ids)).values(vet_id=None))
+
+    counts['dog'] = _purge_dogs(Dog.user_id.in_(user_ids))
+    for model in (EmergencyContact, Veterinarian):
+        rows = _delete(model, model.user_id.in_(user_ids), model.user_id)
+        _forget(model, rows)
+        counts[model.__tablename__] = len(rows)
+
+    users = _delete(User, User.user_id.in_(user_ids), User.token)
+    _forget(User, [(user_id, user_id) for user_id, _ in users])
+    counts['user'] = len(users)
+    tokens = [token for _, token in users if token]
+    on_commit(lambda: [get_token_cache().delete(token) for token in tokens])
+    # The images kept without an uploader changed as well
+    _bump({**counts, 'image': counts['image'] + len(kept)})
+    return counts
+
+
+def _bump(counts):
+    tables = [table for table, count in counts.items() if count]
+    on_commit(lambda: [bump_version(table) for table in tables])
+
+
+def find_orphans():
+    """Ids of rows whose owner, or dog, no longer exists, by table."""
+    users = db.select(User.user_id)
+    orphans = {}
+    for model in (EmergencyContact, Veterinarian, Dog):
+        key = model.__table__.primary_key.columns[0]
+        orphans[model.__tablename__] = db.session.execute(
+            db.select(key).where(model.user_id.is_not(None), model.user_id.not_in(users))).scalars().all()
+    orphans['image'] = db.session.execute(
+        db.select(Image.image_id).where(
+            (Image.user_id.is_not(None) & Image.user_id.not_in(users))
+            | (Image.client_user_id.is_not(None) & Image.client_user_id.not_in(users))
+            | (Image.dog_id.is_not(None) & Image.dog_id.not_in(db.select(Dog.dog_id))))
+    ).scalars().all()
+    return orphans
+
+
+def purge_orphans(orphans):
+    """Delete the rows ``find_orphans()`` returned; returns the number deleted per table."""
+    # Orphaned dogs take their images with them
+    counts = {'image': _purge_images(Image.image_id.in_(orphans['image']) | Image.dog_id.in_(orphans['dog']))}
+    counts['dog'] = _purge_dogs(Dog.dog_id.in_(orphans['dog']))
+    for model in (EmergencyContact, Veterinarian):
+        rows = _delete(model, model.__table__.primary_key.columns[0].in_(orphans[model.__tablename__]), model.user_id)
+        _forget(model, rows)
+        counts[model.__tablename__] = len(rows)
+    db.session.execute(update(Dog).where(Dog.vet_id.not_in(db.select(Veterinarian.vet_id))).values(vet_id=None))
+    _bump(counts)
+    return counts
+
+
+@click.command('purge-orphans')
+@click.option('--dry-run', is_flag=True, help='Only count the orphaned rows.')
+@with_appcontext
+def purge_orphans_command(dry_run):
+    """Delete rows left behind by users and dogs deleted before deletes cascaded."""
+    orphans = find_orphans()
+    if dry_run:
+        for table, row_ids in orphans.items():
+            click.echo(f'{table}: {len(row_ids)} orphaned rows', err=True)
+        return
+    counts = purge_orphans(orphans)
+    db.session.commit()
+    for table, count in counts.items():
+        click.echo(f'{table}: {count} rows deleted', err=True)
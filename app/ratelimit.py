@@ -0,0 +1,132 @@
+import hashlib
+import struct
+import time
+from collections import OrderedDict
+from threading import Lock
+from flask import request, current_app
+from werkzeug.utils import import_string
+from .shared_memory import SharedMap
+
+
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class RateLimited(Exception):
+    """Raised when a token bucket is empty; ``retry_after`` is in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+def _refill(tokens, updated, now, rate, capacity):
+    """Apply the token-bucket rule; returns (tokens left, seconds until the next token or 0)."""
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBackend:
+    """Buckets kept in this process, bounded to the most recently used keys."""
+
+    def __init__(self, config):
+        self.maxsize = config['RATELIMIT_MEMORY_SIZE']
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def take(self, key, rate, capacity):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens, retry_after = _refill(tokens, updated, now, rate, capacity)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class SharedMemoryBackend:
+    """Buckets in a memory-mapped file, so every gunicorn worker on the host shares them.
+
+    The file is a fixed-size open-addressing table of (key hash, tokens, updated)
+    slots guarded by flock; when a key's probe window is full the stalest slot is reused.
+    """
+
+    SLOT = struct.Struct('Qdd')
+    PROBES = 8
+
+    def __init__(self, config):
+        self.slots = config['RATELIMIT_SHARED_SLOTS']
+        self._shared = SharedMap(config['RATELIMIT_SHARED_PATH'], self.SLOT.size * self.slots)
+
+    def _slot(self, shared, digest):
+        start = digest % self.slots
+        stalest, stalest_updated = start, None
+        for i in range(self.PROBES):
+            index = (start + i) % self.slots
+            stored, _, updated = self.SLOT.unpack_from(shared, index * self.SLOT.size)
+            if stored in (digest, 0):
+                return index
+            if stalest_updated is None or updated < stalest_updated:
+                stalest, stalest_updated = index, updated
+        return stalest
+
+    def take(self, key, rate, capacity):
+        # Zero marks an empty slot, so keep real digests non-zero
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+        now = time.time()
+        with self._shared.locked() as shared:
+            offset = self._slot(shared, digest) * self.SLOT.size
+            stored, tokens, updated = self.SLOT.unpack_from(shared, offset)
+            if stored != digest:
+                tokens, updated = capacity, now
+            tokens, retry_after = _refill(tokens, updated, now, rate, capacity)
+            self.SLOT.pack_into(shared, offset, digest, tokens, now)
+        return retry_after
+
+
+_counters = {}
+_counters_lock = Lock()
+
+
+def get_backend():
+    backend = current_app.extensions.get('ratelimit')
+    if backend is None:
+        backend = import_string(current_app.config['RATELIMIT_BACKEND'])
+        backend = current_app.extensions.setdefault('ratelimit', backend(current_app.config))
+    return backend
+
+
+def _parse(limit):
+    # Limits are configured as "<requests>/<seconds>", e.g. "10/60"
+    requests, seconds = limit.split('/')
+    return int(requests) / float(seconds), int(requests)
+
+
+def limit(name, key):
+    """Take a token from the ``name`` bucket for ``key``, raising RateLimited when it is empty."""
+    if not current_app.config['RATELIMIT_ENABLED']:
+        return
+    rate, capacity = _parse(current_app.config[f'RATELIMIT_{name.upper()}'])
+    retry_after = get_backend().take(f'{name}:{key}', rate, capacity)
+    with _counters_lock:
+        counts = _counters.setdefault(name, {'allowed': 0, 'limited': 0})
+        counts['limited' if retry_after else 'allowed'] += 1
+    if retry_after:
+        raise RateLimited(retry_after)
+
+
+def counters():
+    with _counters_lock:
+        return {name: dict(counts) for name, counts in _counters.items()}
+
+
+def limit_writes_by_ip():
+    # Runs before any view, so rejected writes cost no database work
+    if request.method in WRITE_METHODS:
+        limit('write_ip', request.remote_addr)
+
+
+def init_app(app):
+    app.before_request(limit_writes_by_ip)
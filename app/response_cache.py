@@ -0,0 +1,109 @@
+import hashlib
+import struct
+from functools import wraps
+from threading import Lock
+from flask import request, current_app, make_response, Response
+from werkzeug.utils import import_string
+from .routing import primary
+from .shared_memory import SharedMap
+
+
+class LocalVersions:
+    """Per-table version counters kept in this process only."""
+
+    def __init__(self, config):
+        self._versions = {}
+        self._lock = Lock()
+
+    def get(self, tables):
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def bump(self, table):
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+
+
+class SharedVersions:
+    """Per-table version counters in a memory-mapped file shared by every worker on the host.
+
+    Table names hash into a fixed array of counters; a collision only means a
+    write to one table also invalidates another's cached responses.
+    """
+
+    COUNTER = struct.Struct('Q')
+    SLOTS = 256
+
+    def __init__(self, config):
+        self._shared = SharedMap(config['RESPONSE_CACHE_SHARED_PATH'], self.COUNTER.size * self.SLOTS)
+
+    def _offset(self, table):
+        return hashlib.blake2b(table.encode(), digest_size=1).digest()[0] * self.COUNTER.size
+
+    def get(self, tables):
+        # Aligned 8-byte reads need no lock; a torn read can only cause a cache miss
+        shared = self._shared.map
+        return tuple(self.COUNTER.unpack_from(shared, self._offset(table))[0] for table in tables)
+
+    def bump(self, table):
+        offset = self._offset(table)
+        with self._shared.locked() as shared:
+            version = self.COUNTER.unpack_from(shared, offset)[0]
+            self.COUNTER.pack_into(shared, offset, version + 1)
+
+
+def get_store():
+    store = current_app.extensions.get('response_cache')
+    if store is None:
+        config = current_app.config
+        backend = import_string(config['RESPONSE_CACHE_BACKEND'])
+        store = current_app.extensions.setdefault('response_cache', backend(config['RESPONSE_CACHE_SIZE'], config['RESPONSE_CACHE_TTL']))
+    return store
+
+
+def get_versions():
+    versions = current_app.extensions.get('response_cache_versions')
+    if versions is None:
+        backend = import_string(current_app.config['RESPONSE_CACHE_VERSIONS'])
+        versions = current_app.extensions.setdefault('response_cache_versions', backend(current_app.config))
+    return versions
+
+
+def bump_version(table):
+    """Invalidate every cached response built from ``table``; call once the write is committed."""
+    get_versions().bump(table)
+
+
+def cached(*tables):
+    """Serve repeated GETs of a view from the response cache.
+
+    Entries are keyed by endpoint, view arguments, query string and the current
+    version of every table in ``tables``, so any committed write to one of them
+    makes the old entries unreachable and the next read rebuilds the response.
+    That read goes to the primary, since a lagging replica would otherwise fill
+    the new entry with the old data for the whole TTL. Hits need no database,
+    and streamed responses are never cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config['RESPONSE_CACHE_ENABLED']:
+                return view(*args, **kwargs)
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+                get_versions().get(tables),
+            )
+            store = get_store()
+            entry = store.get(key)
+            if entry is not None:
+                data, status, headers = entry
+                return Response(data, status=status, headers=headers).make_conditional(request)
+
+            with primary():
+                response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                store.set(key, (response.get_data(), response.status_code, list(response.headers)))
+            return response
+        return wrapper
+    return decorator
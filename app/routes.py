@@ -1,21 +1,58 @@
-from flask import request, render_template
-from app import app, db
+import math
+import posixpath
+from flask import Blueprint, current_app, request, render_template, send_from_directory, Response, stream_with_context
+from app import db
 from .models import User, EmergencyContact, Veterinarian, Dog, Image
 from .auth import basic_auth, token_auth
-import secrets
+from .pagination import paginate
+from .bulk import bulk_write
+from .batch import run_batch
+from .profiles import client_profile, profile_version
+from .sync import DEFAULT_SYNC_LIMIT, MAX_SYNC_LIMIT, changes_since
+from .events import event_stream
+from .unit_of_work import commit
+from .purge import MAX_PURGE_ITEMS, purge_users, purge_dogs
+from .search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, KINDS as SEARCH_KINDS, search
+from .export import EXPORTS, FORMATS, export
+from .serializers import InvalidFields, model_columns, select_columns, select_requested, requested_fields, requested_includes, rows_to_dicts, users_to_dicts
+from .conditional import conditional, row_version, collection_version
+from .cache import get_token_cache
+from .uploads import IMAGE_TYPES, verify_upload, store_upload, variant_urls, schedule_variants
+from .storage import TEMP_DIR, get_storage
+from .instrumentation import render_metrics
+from .passwords import HasherBusy
+from .ratelimit import RateLimited
+from .response_cache import cached
+from .routing import read_only
+
+
+# Every route of the API; create_app() registers it
+api = Blueprint('api', __name__)
 
 
 
 # Define a route
-@app.route("/")
+@api.route("/")
 def index():
     return render_template('index.html')
 
+@api.app_errorhandler(HasherBusy)
+def handle_hasher_busy(error):
+    return {'error': 'Too many sign-ins are being processed. Please try again shortly'}, 503, {'Retry-After': '1'}
+
+@api.app_errorhandler(InvalidFields)
+def handle_invalid_fields(error):
+    return {'error': str(error)}, 400
+
+@api.app_errorhandler(RateLimited)
+def handle_rate_limited(error):
+    return {'error': 'Too many requests. Please slow down and try again shortly'}, 429, {'Retry-After': str(math.ceil(error.retry_after))}
+
 #User endpoints
 
 #create a  new user
 
-@app.route('/users', methods=['POST'])
+@api.route('/users', methods=['POST'])
 def create_user():
     #Check to make sure that the request body is JSON
     if not request.is_json:
@@ -42,15 +79,16 @@ def create_user():
     check_users = db.session.execute(db.select(User).where(User.email == email)).scalars().all()
     if check_users:
         return {'error': "A user with that username and/or email already exists"}, 400 
-    token = secrets.token_hex(16)   
     # Create a new instance of user with the data from the request
-    new_user = User(first_name=first_name, last_name=last_name, email=email, password=password, token=token)
+    new_user = User(first_name=first_name, last_name=last_name, email=email, password=password)
+    # Issue the user's first API token
+    new_user.get_token()
     
     return new_user.to_dict(), 201
 
 
 
-@app.route('/users/me', methods=['PUT'])
+@api.route('/users/me', methods=['PUT'])
 @token_auth.login_required
 def update_me():
     user = token_auth.current_user()
@@ -58,48 +96,203 @@ def update_me():
     user.update(**data)
     return user.to_dict() 
 
-@app.route('/users/me', methods=['DELETE'])
+@api.route('/users/me', methods=['DELETE'])
 @token_auth.login_required
 def delete_me():
     user = token_auth.current_user()
     user.delete()
     return {'success': 'User has been successfully deleted'}, 200
 
-@app.route('/users/me', methods=['GET'])
+@api.route('/users/me', methods=['GET'])
+@read_only
 @token_auth.login_required
+@conditional(lambda: User.version_query(token_auth.current_user().user_id))
 def get_me():
     user = token_auth.current_user()
-    return user.to_dict()
-
-@app.route('/users/<int:user_id>', methods=['GET'])
+    # Only here, on the caller's own row, are the token and its expiration returned
+    fields = requested_fields(User, credentials=True)
+    # The authenticated user is already loaded, so only the embedded rows need queries
+    row = {column.key: getattr(user, column.key) for column in model_columns(User, fields.get(None), credentials=True)}
+    return users_to_dicts([row], requested_includes(fields), fields)[0]
+
+@api.route('/users/<int:user_id>', methods=['GET'])
+@read_only
+@cached('user', 'emergency_contact', 'veterinarian', 'dog', 'image')
+@conditional(User.version_query)
 def get_user(user_id):
-    user = db.session.execute(db.select(User).where(User.user_id == user_id)).scalar_one_or_none()
-    if user is None:
+    fields = requested_fields(User)
+    row = db.session.execute(select_columns(User, fields.get(None)).where(User.user_id == user_id)).mappings().one_or_none()
+    if row is None:
         return {'error': 'User not found'}, 404
-    return user.to_dict()
+    return users_to_dicts([row], requested_includes(fields), fields)[0]
 
-@app.route('/users', methods=['GET'])
+@api.route('/users', methods=['GET'])
+@read_only
+@cached('user', 'emergency_contact', 'veterinarian', 'dog', 'image')
 def get_users():
-    users = db.session.execute(db.select(User)).scalars().all()
-    return [user.to_dict() for user in users]
+    fields = requested_fields(User)
+    include = requested_includes(fields)
+    return paginate(select_columns(User, fields.get(None)), User.user_id, lambda rows: users_to_dicts(rows, include, fields))
+
+@api.route('/clients/<int:user_id>/profile', methods=['GET'])
+@read_only
+@token_auth.login_required
+@conditional(profile_version)
+def get_client_profile(user_id):
+    profile = client_profile(user_id)
+    if profile is None:
+        return {'error': 'User not found'}, 404
+    return profile
+
+# Not read_only: only the primary knows which logged changes may still commit, see lock_change_log()
+@api.route('/sync', methods=['GET'])
+@token_auth.login_required
+def sync():
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', DEFAULT_SYNC_LIMIT))
+    except ValueError:
+        return {'error': 'since and limit must be integers'}, 400
+    if not 1 <= limit <= MAX_SYNC_LIMIT:
+        return {'error': f'limit must be between 1 and {MAX_SYNC_LIMIT}'}, 400
+    return changes_since(since, limit, token_auth.current_user())
+
+@api.route('/search', methods=['GET'])
+@read_only
+@token_auth.login_required
+def search_records():
+    text = request.args.get('q', '')
+    kinds = request.args.get('type', ','.join(SEARCH_KINDS)).split(',')
+    if set(kinds) - set(SEARCH_KINDS):
+        return {'error': f"type must be one or more of {', '.join(SEARCH_KINDS)}"}, 400
+    try:
+        limit = int(request.args.get('limit', DEFAULT_SEARCH_LIMIT))
+    except ValueError:
+        return {'error': 'limit must be an integer'}, 400
+    if not 1 <= limit <= MAX_SEARCH_LIMIT:
+        return {'error': f'limit must be between 1 and {MAX_SEARCH_LIMIT}'}, 400
+    if not text.strip():
+        return {'error': 'q must be given'}, 400
+    return {'results': search(text, token_auth.current_user(), kinds, limit)}
+
+@api.route('/events', methods=['GET'])
+@token_auth.login_required
+def events():
+    # Browsers resend the id of the last event they saw when an EventSource reconnects
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_id is not None:
+        try:
+            last_id = int(last_id)
+        except ValueError:
+            return {'error': 'Last-Event-ID must be an integer'}, 400
+    return event_stream(token_auth.current_user().user_id, last_id)
+
+@api.route('/batch', methods=['POST'])
+@token_auth.login_required
+def batch():
+    return run_batch()
 
 # Log In endpoint
 
-@app.route('/login', methods=['GET'])
+@api.route('/login', methods=['GET'])
 @basic_auth.login_required
 def login():
     user = basic_auth.current_user()
     if user: 
+        # Rotate the token if it has expired (or is about to) before handing it back
+        user.get_token()
         return user.to_dict()
     else:   
         return {'error': 'User not found'}, 404
     
 
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@api.route('/export', methods=['GET'])
+@read_only
+@token_auth.login_required
+def get_export():
+    user = token_auth.current_user()
+    if not user.is_admin:
+        return {'error': 'You do not have permission to view this resource'}, 403
+    name = request.args.get('table')
+    fmt = request.args.get('format', 'ndjson')
+    if name not in EXPORTS:
+        return {'error': f"table must be one of {', '.join(EXPORTS)}"}, 400
+    if fmt not in FORMATS:
+        return {'error': f"format must be one of {', '.join(FORMATS)}"}, 400
+    # No Content-Length, so the body goes out with chunked transfer encoding as it is generated
+    headers = {'Content-Disposition': f'attachment; filename={name}.{fmt}'}
+    return Response(stream_with_context(export(name, fmt)), mimetype=FORMATS[fmt], headers=headers)
+
+
+@api.route('/admin/token-cache', methods=['GET'])
+@token_auth.login_required
+def get_token_cache_stats():
+    user = token_auth.current_user()
+    if not user.is_admin:
+        return {'error': 'You do not have permission to view this resource'}, 403
+    return get_token_cache().stats()
+
+@api.route('/admin/purge', methods=['POST'])
+@token_auth.login_required
+def purge_records():
+    user = token_auth.current_user()
+    if not user.is_admin:
+        return {'error': 'You do not have permission to perform this action'}, 403
+    if not request.is_json:
+        return {'error': 'Your content-type must be application/json'}, 400
+    data = request.json
+    if not isinstance(data, dict):
+        return {'error': 'The request body must be an object with users and/or dogs arrays'}, 400
+    user_ids = data.get('users', [])
+    dog_ids = data.get('dogs', [])
+    for ids in (user_ids, dog_ids):
+        if not isinstance(ids, list) or not all(isinstance(row_id, int) for row_id in ids):
+            return {'error': 'users and dogs must be arrays of ids'}, 400
+    if len(user_ids) + len(dog_ids) > MAX_PURGE_ITEMS:
+        return {'error': f'No more than {MAX_PURGE_ITEMS} ids can be purged at once'}, 400
+    if user.user_id in user_ids:
+        return {'error': 'You cannot purge your own account'}, 400
+    deleted = {}
+    # One transaction for the whole purge, committed by the request's unit of work
+    for counts in (purge_users(user_ids) if user_ids else {}, purge_dogs(dog_ids) if dog_ids else {}):
+        for table, count in counts.items():
+            deleted[table] = deleted.get(table, 0) + count
+    commit()
+    return {'deleted': deleted}
+
+@api.route('/admin/users/<int:user_id>/admin', methods=['PUT'])
+@token_auth.login_required
+def set_admin(user_id):
+    user = token_auth.current_user()
+    if not user.is_admin:
+        return {'error': 'You do not have permission to perform this action'}, 403
+    if not request.is_json:
+        return {'error': 'Your content-type must be application/json'}, 400
+    data = request.json
+    if not isinstance(data, dict) or not isinstance(data.get('is_admin'), bool):
+        return {'error': 'is_admin must be true or false'}, 400
+    if user_id == user.user_id:
+        return {'error': 'You cannot change your own admin status'}, 400
+    target = db.session.get(User, user_id)
+    if target is None:
+        return {'error': 'User not found'}, 404
+    target.is_admin = data['is_admin']
+    # save() bumps the user table's version, which every worker on this host checks
+    # its cached tokens against, so the change applies to the user's next request
+    target.save()
+    return {'user_id': target.user_id, 'is_admin': target.is_admin}
+
+
 
 
 # Image endpoints
 
-@app.route('/images', methods=['POST'])
+@api.route('/images', methods=['POST'])
 @token_auth.login_required
 def create_image():
     data = request.json
@@ -107,15 +300,59 @@ def create_image():
     image = Image(user_id=user.user_id, **data)
     return image.to_dict(), 201
 
-@app.route('/images/<int:image_id>', methods=['GET'])
+@api.route('/images/bulk', methods=['POST'])
+@token_auth.login_required
+def bulk_images():
+    user = token_auth.current_user()
+    return bulk_write(Image, Image.image_id, user)
+
+@api.route('/images/upload', methods=['POST'])
 @token_auth.login_required
+def upload_image():
+    upload = request.files.get('image')
+    if upload is None:
+        return {'error': 'An image file must be sent in the image field of a multipart form'}, 400
+    if upload.mimetype not in IMAGE_TYPES:
+        return {'error': f"Images must be one of {', '.join(IMAGE_TYPES)}"}, 400
+    if not verify_upload(upload):
+        return {'error': f'The file is not a valid {upload.mimetype} image'}, 400
+
+    data = {'description': request.form.get('description')}
+    try:
+        for field in ('client_user_id', 'dog_id'):
+            if request.form.get(field):
+                data[field] = int(request.form[field])
+    except ValueError:
+        return {'error': 'client_user_id and dog_id must be integers'}, 400
+
+    user = token_auth.current_user()
+    content_hash, key = store_upload(upload)
+    urls = variant_urls(content_hash)
+    image = Image(user_id=user.user_id, image_url=get_storage().url(key), content_hash=content_hash, **(urls or {}), **data)
+    # Resizing happens off the request thread; a duplicate upload reuses the existing variants
+    if urls is None:
+        schedule_variants(content_hash, key)
+    return image.to_dict(), 201
+
+@api.route('/media/<path:key>', methods=['GET'])
+def get_media(key):
+    # Uploads being received are staged in TEMP_DIR and were never checked, so never serve them
+    if posixpath.normpath(key).split('/')[0] == TEMP_DIR:
+        return {'error': 'File not found'}, 404
+    # Stored files are content-addressed, so they never change and can be cached forever
+    return send_from_directory(current_app.config['UPLOAD_FOLDER'], key, max_age=365 * 24 * 60 * 60)
+
+@api.route('/images/<int:image_id>', methods=['GET'])
+@read_only
+@token_auth.login_required
+@conditional(lambda image_id: row_version(Image.image_id, image_id))
 def get_image(image_id):
-    image = db.session.execute(db.select(Image).where(Image.image_id == image_id)).scalar_one_or_none()
+    image = db.session.execute(select_requested(Image).where(Image.image_id == image_id)).mappings().one_or_none()
     if image is None:
         return {'error': 'Image not found'}, 404
-    return image.to_dict()
+    return dict(image)
 
-@app.route('/images/<int:image_id>', methods=['DELETE'])
+@api.route('/images/<int:image_id>', methods=['DELETE'])
 @token_auth.login_required
 def delete_image(image_id):
     image = db.session.execute(db.select(Image).where(Image.image_id == image_id)).scalar_one_or_none()
@@ -124,23 +361,26 @@ def delete_image(image_id):
     image.delete()
     return {'success': 'Image has been successfully deleted'}, 200
 
-@app.route('/images', methods=['GET'])
+@api.route('/images', methods=['GET'])
+@read_only
+@cached('image')
 def get_images():
-    images = db.session.execute(db.select(Image)).scalars().all()
-    return [image.to_dict() for image in images]
+    return paginate(select_requested(Image), Image.image_id, rows_to_dicts)
 
-@app.route('/images/client/<int:client_user_id>', methods=['GET'])
+@api.route('/images/client/<int:client_user_id>', methods=['GET'])
+@read_only
 @token_auth.login_required
+@conditional(lambda client_user_id: collection_version(Image.client_user_id, client_user_id))
 def get_images_by_client_id(client_user_id):
-    images = db.session.execute(db.select(Image).where(Image.client_user_id == client_user_id)).scalars().all()
+    images = db.session.execute(select_requested(Image).where(Image.client_user_id == client_user_id)).mappings().all()
     if not images:
         return {'error': 'No images found for the user'}, 404
-    return [image.to_dict() for image in images]
+    return rows_to_dicts(images)
 
 
 # Emergency Contact endpoints
 
-@app.route('/emergency-contacts', methods=['POST'])
+@api.route('/emergency-contacts', methods=['POST'])
 @token_auth.login_required
 def create_emergency_contact():
     data = request.json
@@ -148,23 +388,33 @@ def create_emergency_contact():
     emergency_contact = EmergencyContact(user_id=user.user_id, **data)
     return emergency_contact.to_dict(), 201
 
-@app.route('/emergency-contacts/<int:emergency_contact_id>', methods=['GET'])
+@api.route('/emergency-contacts/bulk', methods=['POST'])
+@token_auth.login_required
+def bulk_emergency_contacts():
+    user = token_auth.current_user()
+    return bulk_write(EmergencyContact, EmergencyContact.ec_id, user)
+
+@api.route('/emergency-contacts/<int:emergency_contact_id>', methods=['GET'])
+@read_only
 @token_auth.login_required
+@conditional(lambda emergency_contact_id: row_version(EmergencyContact.ec_id, emergency_contact_id))
 def get_emergency_contact(emergency_contact_id):
-    emergency_contact = db.session.execute(db.select(EmergencyContact).where(EmergencyContact.ec_id == emergency_contact_id)).scalar_one_or_none()
+    emergency_contact = db.session.execute(select_requested(EmergencyContact).where(EmergencyContact.ec_id == emergency_contact_id)).mappings().one_or_none()
     if emergency_contact is None:
         return {'error': 'Emergency contact not found'}, 404
-    return emergency_contact.to_dict()
+    return dict(emergency_contact)
 
-@app.route('/emergency-contacts/user/<int:user_id>', methods=['GET'])
+@api.route('/emergency-contacts/user/<int:user_id>', methods=['GET'])
+@read_only
 @token_auth.login_required
+@conditional(lambda user_id: collection_version(EmergencyContact.user_id, user_id))
 def get_emergency_contact_by_user_id(user_id):
-    emergency_contact = db.session.execute(db.select(EmergencyContact).where(EmergencyContact.user_id == user_id)).scalar_one_or_none()
+    emergency_contact = db.session.execute(select_requested(EmergencyContact).where(EmergencyContact.user_id == user_id)).mappings().one_or_none()
     if emergency_contact is None:
         return {'error': 'Emergency contact not found'}, 404
-    return emergency_contact.to_dict()
+    return dict(emergency_contact)
 
-@app.route('/emergency-contacts/<int:emergency_contact_id>', methods=['DELETE'])
+@api.route('/emergency-contacts/<int:emergency_contact_id>', methods=['DELETE'])
 @token_auth.login_required
 def delete_emergency_contact(emergency_contact_id):
     emergency_contact = db.session.execute(db.select(EmergencyContact).where(EmergencyContact.ec_id == emergency_contact_id)).scalar_one_or_none()
@@ -173,13 +423,13 @@ def delete_emergency_contact(emergency_contact_id):
     emergency_contact.delete()
     return {'success': 'Emergency contact has been successfully deleted'}, 200
 
-@app.route('/emergency-contacts', methods=['GET'])
+@api.route('/emergency-contacts', methods=['GET'])
+@read_only
 @token_auth.login_required
 def get_emergency_contacts():
-    emergency_contacts = db.session.execute(db.select(EmergencyContact)).scalars().all()
-    return [emergency_contact.to_dict() for emergency_contact in emergency_contacts]
+    return paginate(select_requested(EmergencyContact), EmergencyContact.ec_id, rows_to_dicts)
 
-@app.route('/emergency-contacts/<int:emergency_contact_id>', methods=['PUT'])
+@api.route('/emergency-contacts/<int:emergency_contact_id>', methods=['PUT'])
 @token_auth.login_required
 def update_emergency_contact(emergency_contact_id):
     emergency_contact = db.session.execute(db.select(EmergencyContact).where(EmergencyContact.ec_id == emergency_contact_id)).scalar_one_or_none()
@@ -193,7 +443,7 @@ def update_emergency_contact(emergency_contact_id):
 
 # Veterinarian endpoints
 
-@app.route('/veterinarians', methods=['POST'])
+@api.route('/veterinarians', methods=['POST'])
 @token_auth.login_required
 def create_veterinarian():
     data = request.json
@@ -201,15 +451,23 @@ def create_veterinarian():
     veterinarian = Veterinarian(user_id=user.user_id, **data)
     return veterinarian.to_dict(), 201
 
-@app.route('/veterinarians/<int:veterinarian_id>', methods=['GET'])
+@api.route('/veterinarians/bulk', methods=['POST'])
 @token_auth.login_required
+def bulk_veterinarians():
+    user = token_auth.current_user()
+    return bulk_write(Veterinarian, Veterinarian.vet_id, user)
+
+@api.route('/veterinarians/<int:veterinarian_id>', methods=['GET'])
+@read_only
+@token_auth.login_required
+@conditional(lambda veterinarian_id: row_version(Veterinarian.vet_id, veterinarian_id))
 def get_veterinarian(veterinarian_id):
-    veterinarian = db.session.execute(db.select(Veterinarian).where(Veterinarian.vet_id == veterinarian_id)).scalar_one_or_none()
+    veterinarian = db.session.execute(select_requested(Veterinarian).where(Veterinarian.vet_id == veterinarian_id)).mappings().one_or_none()
     if veterinarian is None:
         return {'error': 'Veterinarian not found'}, 404
-    return veterinarian.to_dict()
+    return dict(veterinarian)
 
-@app.route('/veterinarians/<int:veterinarian_id>', methods=['DELETE'])
+@api.route('/veterinarians/<int:veterinarian_id>', methods=['DELETE'])
 @token_auth.login_required
 def delete_veterinarian(veterinarian_id):
     veterinarian = db.session.execute(db.select(Veterinarian).where(Veterinarian.vet_id == veterinarian_id)).scalar_one_or_none()
@@ -218,13 +476,13 @@ def delete_veterinarian(veterinarian_id):
     veterinarian.delete()
     return {'success': 'Veterinarian has been successfully deleted'}, 200
 
-@app.route('/veterinarians', methods=['GET'])
+@api.route('/veterinarians', methods=['GET'])
+@read_only
 @token_auth.login_required
 def get_veterinarians():
-    veterinarians = db.session.execute(db.select(Veterinarian)).scalars().all()
-    return [veterinarian.to_dict() for veterinarian in veterinarians]
+    return paginate(select_requested(Veterinarian), Veterinarian.vet_id, rows_to_dicts)
 
-@app.route('/veterinarians/<int:veterinarian_id>', methods=['PUT'])
+@api.route('/veterinarians/<int:veterinarian_id>', methods=['PUT'])
 @token_auth.login_required
 def update_veterinarian(veterinarian_id):
     veterinarian = db.session.execute(db.select(Veterinarian).where(Veterinarian.vet_id == veterinarian_id)).scalar_one_or_none()
@@ -235,18 +493,20 @@ def update_veterinarian(veterinarian_id):
     veterinarian.update(**data)
     return veterinarian.to_dict()
 
-@app.route('/veterinarians/user/<int:user_id>', methods=['GET'])
+@api.route('/veterinarians/user/<int:user_id>', methods=['GET'])
+@read_only
 @token_auth.login_required
+@conditional(lambda user_id: collection_version(Veterinarian.user_id, user_id))
 def get_veterinarian_by_user_id(user_id):
-    veterinarian = db.session.execute(db.select(Veterinarian).where(Veterinarian.user_id == user_id)).scalar_one_or_none()
+    veterinarian = db.session.execute(select_requested(Veterinarian).where(Veterinarian.user_id == user_id)).mappings().one_or_none()
     if veterinarian is None:
         return {'error': 'Veterinarian not found'}, 404
-    return veterinarian.to_dict()
+    return dict(veterinarian)
 
 
 # Dog endpoints
 
-@app.route('/dogs', methods=['POST'])
+@api.route('/dogs', methods=['POST'])
 @token_auth.login_required
 def create_dog():
     data = request.json
@@ -254,15 +514,23 @@ def create_dog():
     dog = Dog(user_id=user.user_id, **data)
     return dog.to_dict(), 201
 
-@app.route('/dogs/<int:dog_id>', methods=['GET'])
+@api.route('/dogs/bulk', methods=['POST'])
 @token_auth.login_required
+def bulk_dogs():
+    user = token_auth.current_user()
+    return bulk_write(Dog, Dog.dog_id, user)
+
+@api.route('/dogs/<int:dog_id>', methods=['GET'])
+@read_only
+@token_auth.login_required
+@conditional(lambda dog_id: row_version(Dog.dog_id, dog_id))
 def get_dog(dog_id):
-    dog = db.session.execute(db.select(Dog).where(Dog.dog_id == dog_id)).scalar_one_or_none()
+    dog = db.session.execute(select_requested(Dog).where(Dog.dog_id == dog_id)).mappings().one_or_none()
     if dog is None:
         return {'error': 'Dog not found'}, 404
-    return dog.to_dict()
+    return dict(dog)
 
-@app.route('/dogs/<int:dog_id>', methods=['DELETE'])
+@api.route('/dogs/<int:dog_id>', methods=['DELETE'])
 @token_auth.login_required
 def delete_dog(dog_id):
     dog = db.session.execute(db.select(Dog).where(Dog.dog_id == dog_id)).scalar_one_or_none()
@@ -271,12 +539,13 @@ def delete_dog(dog_id):
     dog.delete()
     return {'success': 'Dog has been successfully deleted'}, 200
 
-@app.route('/dogs', methods=['GET'])
+@api.route('/dogs', methods=['GET'])
+@read_only
+@cached('dog')
 def get_dogs():
-    dogs = db.session.execute(db.select(Dog)).scalars().all()
-    return [dog.to_dict() for dog in dogs]
+    return paginate(select_requested(Dog), Dog.dog_id, rows_to_dicts)
 
-@app.route('/dogs/<int:dog_id>', methods=['PUT'])
+@api.route('/dogs/<int:dog_id>', methods=['PUT'])
 @token_auth.login_required
 def update_dog(dog_id):
     dog = db.session.execute(db.select(Dog).where(Dog.dog_id == dog_id)).scalar_one_or_none()
@@ -287,13 +556,15 @@ def update_dog(dog_id):
     dog.update(**data)
     return dog.to_dict()
 
-@app.route('/dogs/user/<int:user_id>', methods=['GET'])
+@api.route('/dogs/user/<int:user_id>', methods=['GET'])
+@read_only
 @token_auth.login_required
+@conditional(lambda user_id: collection_version(Dog.user_id, user_id))
 def get_dogs_by_user_id(user_id):
-    dogs = db.session.execute(db.select(Dog).where(Dog.user_id == user_id)).scalars().all()
+    dogs = db.session.execute(select_requested(Dog).where(Dog.user_id == user_id)).mappings().all()
     if not dogs:
         return {'error': 'No dogs found for the user'}, 404
-    return [dog.to_dict() for dog in dogs]
+    return rows_to_dicts(dogs)
 
 
 
@@ -0,0 +1,112 @@
+import hashlib
+import random
+import struct
+import time
+from contextlib import contextmanager
+from flask import g, request, has_request_context, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+from .shared_memory import SharedMap
+
+
+REPLICA_BIND_PREFIX = 'replica'
+
+
+class RecentWrites:
+    """When each client last wrote, in a memory-mapped file shared by every worker on the host.
+
+    Clients hash into a fixed array of timestamps; a collision only sends another
+    client's reads to the primary for a few seconds.
+    """
+
+    TIMESTAMP = struct.Struct('d')
+    SLOTS = 4096
+
+    def __init__(self, path):
+        self._shared = SharedMap(path, self.TIMESTAMP.size * self.SLOTS)
+
+    def _offset(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') % self.SLOTS * self.TIMESTAMP.size
+
+    def mark(self, key):
+        # Aligned 8-byte writes need no lock; racing writers store nearly the same time anyway
+        self.TIMESTAMP.pack_into(self._shared.map, self._offset(key), time.time())
+
+    def seconds_since(self, key):
+        return time.time() - self.TIMESTAMP.unpack_from(self._shared.map, self._offset(key))[0]
+
+
+def get_recent_writes():
+    recent_writes = current_app.extensions.get('recent_writes')
+    if recent_writes is None:
+        recent_writes = current_app.extensions.setdefault(
+            'recent_writes', RecentWrites(current_app.config['DB_REPLICA_STICKY_PATH']))
+    return recent_writes
+
+
+def read_only(view):
+    """Mark a view whose queries may be answered by a read replica."""
+    view.read_only = True
+    return view
+
+
+@contextmanager
+def primary():
+    """Send the enclosed queries to the primary even inside a read-only view."""
+    previous = g.get('db_primary', False)
+    g.db_primary = True
+    try:
+        yield
+    finally:
+        g.db_primary = previous
+
+
+def _client_key():
+    return request.headers.get('Authorization') or request.remote_addr or ''
+
+
+class RoutingSession(Session):
+    """Route the reads of read-only views to a replica bind and everything else to the primary.
+
+    Each request picks one replica at random and reads only from it.
+
+    A request goes to the primary once it has written, inside ``primary()``, or
+    when the same client wrote less than DB_REPLICA_STICKY_SECONDS ago, so
+    clients always read their own writes despite replication lag.
+    """
+
+    def _replicas(self):
+        return [engine for key, engine in self._db.engines.items() if key and key.startswith(REPLICA_BIND_PREFIX)]
+
+    def _reads_from_replica(self):
+        if g.get('db_wrote') or g.get('db_primary'):
+            return False
+        view = current_app.view_functions.get(request.endpoint)
+        if not getattr(view, 'read_only', False):
+            return False
+        return get_recent_writes().seconds_since(_client_key()) > current_app.config['DB_REPLICA_STICKY_SECONDS']
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            replicas = self._replicas()
+            if replicas:
+                if self._flushing or isinstance(clause, UpdateBase):
+                    g.db_wrote = True
+                elif self._reads_from_replica():
+                    # One replica per request, so a response and its validators come from the same point in time
+                    if 'db_replica' not in g:
+                        g.db_replica = random.choice(replicas)
+                    return g.db_replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def remember_writes(response):
+    # Keep this client on the primary until its writes have reached the replicas
+    if g.pop('db_wrote', False) and response.status_code < 400:
+        get_recent_writes().mark(_client_key())
+    return response
+
+
+def init_app(app):
+    app.after_request(remember_writes)
@@ -0,0 +1,156 @@
+import re
+from functools import reduce
+from sqlalchemy import DDL, event, insert, delete
+from sqlalchemy.orm import Session
+from . import db
+from .models import User, Veterinarian, Dog
+from .serializers import model_columns
+
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_TERMS = 10
+
+# The models that are searched, with the columns each one's document is built from.
+# The position of a model is part of its documents' rowid, so only ever append.
+SEARCHED = {
+    'dog': (Dog, ('name', 'breed', 'health_conditions', 'allergies', 'medications')),
+    'user': (User, ('first_name', 'last_name', 'email', 'phone_number')),
+    'veterinarian': (Veterinarian, ('name', 'clinic')),
+}
+KINDS = list(SEARCHED)
+SEARCHED_MODELS = {model: kind for kind, (model, _) in SEARCHED.items()}
+
+# Words too common to narrow a search, e.g. "the golden with the chicken allergy"
+STOP_WORDS = {'a', 'an', 'and', 'at', 'for', 'in', 'is', 'of', 'on', 'or', 'the', 'to', 'with'}
+
+# One document per searched row, keyed by rowid = row id * len(KINDS) + position of its kind.
+# It is not part of the models' metadata: each database keeps it in its own kind of index,
+# created on every create_all(), hence IF NOT EXISTS.
+search_index = db.table('search_index', db.column('rowid'), db.column('user_id'), db.column('body'))
+
+CREATE_SEARCH_INDEX = {
+    # Porter stemming lets "allergy" find "allergies"; prefix indexes make "gold*" a lookup
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "user_id UNINDEXED, body, tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')",
+    ],
+    'postgresql': [
+        "CREATE TABLE IF NOT EXISTS search_index ("
+        "rowid BIGINT PRIMARY KEY, user_id INTEGER, body TEXT NOT NULL, "
+        "document TSVECTOR GENERATED ALWAYS AS "
+        "(to_tsvector('english', regexp_replace(body, '[^[:alnum:]]+', ' ', 'g'))) STORED)",
+        "CREATE INDEX IF NOT EXISTS ix_search_index_document ON search_index USING GIN (document)",
+    ],
+}
+
+for dialect, statements in CREATE_SEARCH_INDEX.items():
+    for statement in statements:
+        event.listen(db.metadata, 'after_create', DDL(statement).execute_if(dialect=dialect))
+    event.listen(db.metadata, 'before_drop', DDL('DROP TABLE IF EXISTS search_index').execute_if(dialect=dialect))
+
+
+def _documents(kind, row_ids=None):
+    """A select of ``(rowid, user_id, body)`` for the ``kind`` rows with ``row_ids``, or all of them."""
+    model, columns = SEARCHED[kind]
+    key = model.__table__.primary_key.columns[0]
+    body = reduce(lambda text, column: text + ' ' + column,
+                  [db.func.coalesce(getattr(model, column), '') for column in columns])
+    query = db.select(key * len(KINDS) + KINDS.index(kind), model.user_id, body)
+    if row_ids is not None:
+        query = query.where(key.in_(row_ids))
+    return query
+
+
+def reindex(connection, model, row_ids):
+    """Bring the documents of ``model``'s ``row_ids`` up to date, dropping those of deleted rows.
+
+    Writes that bypass the unit of work (multi-row INSERTs) call this themselves;
+    everything flushed through the session is reindexed automatically.
+    """
+    kind = SEARCHED_MODELS.get(model)
+    row_ids = list(row_ids)
+    if kind is None or not row_ids:
+        return
+    rowids = [row_id * len(KINDS) + KINDS.index(kind) for row_id in row_ids]
+    connection.execute(delete(search_index).where(search_index.c.rowid.in_(rowids)))
+    connection.execute(insert(search_index).from_select(['rowid', 'user_id', 'body'], _documents(kind, row_ids)))
+
+
+@event.listens_for(Session, 'after_flush')
+def reindex_flushed_rows(session, flush_context):
+    # Runs inside the flush's transaction, so the index always matches what commits
+    changed = {}
+    for obj in session.new | session.dirty | session.deleted:
+        kind = SEARCHED_MODELS.get(type(obj))
+        if kind is None:
+            continue
+        if obj in session.dirty:
+            state = db.inspect(obj)
+            if not any(state.attrs[column].history.has_changes() for column in SEARCHED[kind][1] + ('user_id',)):
+                continue
+        changed.setdefault(type(obj), []).append(obj.__mapper__.primary_key_from_instance(obj)[0])
+    for model, row_ids in changed.items():
+        reindex(session.connection(), model, row_ids)
+
+
+def index_existing_rows():
+    """(Re)build every document, for rows written before, or around, the index."""
+    db.session.execute(delete(search_index))
+    for kind in KINDS:
+        db.session.execute(insert(search_index).from_select(['rowid', 'user_id', 'body'], _documents(kind)))
+
+
+def search_terms(text):
+    """The words of ``text`` worth searching for, lowercased."""
+    words = [word for word in re.findall(r'\w+', text.lower()) if word not in STOP_WORDS]
+    return list(dict.fromkeys(words))[:MAX_SEARCH_TERMS]
+
+
+def _matches(terms, user):
+    """A select of matching ``rowid``s, best first; every term must match, as a prefix."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        query = db.func.to_tsquery('english', ' & '.join(f'{term}:*' for term in terms))
+        document = db.literal_column('document')
+        matches = (db.select(search_index.c.rowid)
+                   .where(document.op('@@')(query))
+                   .order_by(db.func.ts_rank(document, query).desc()))
+    else:
+        # Quoted, so FTS5 reads every term as a word whatever it spells
+        query = ' '.join(f'"{term}"*' for term in terms)
+        matches = (db.select(search_index.c.rowid)
+                   .where(db.literal_column('search_index').op('MATCH')(query))
+                   .order_by(db.literal_column('rank')))
+    if not user.is_admin:
+        matches = matches.where(search_index.c.user_id == user.user_id)
+    return matches
+
+
+def search(text, user, kinds=KINDS, limit=DEFAULT_SEARCH_LIMIT):
+    """Rank the dogs, clients and vets of ``kinds`` whose documents contain every word of ``text``.
+
+    Words match as prefixes, so "gold chick" finds a golden retriever with a
+    chicken allergy. Admins search every row and other users only the rows they
+    own. Each result is ``{"type", "id", "data"}``, ``data`` being the row's columns.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return []
+    matches = _matches(terms, user)
+    if len(kinds) < len(KINDS):
+        positions = [KINDS.index(kind) for kind in kinds]
+        matches = matches.where((search_index.c.rowid % len(KINDS)).in_(positions))
+    rowids = db.session.execute(matches.limit(limit)).scalars().all()
+
+    hits = [(KINDS[rowid % len(KINDS)], rowid // len(KINDS)) for rowid in rowids]
+    rows = {}
+    for kind in kinds:
+        row_ids = [row_id for hit_kind, row_id in hits if hit_kind == kind]
+        if not row_ids:
+            continue
+        model = SEARCHED[kind][0]
+        key = model.__table__.primary_key.columns[0]
+        for row in db.session.execute(db.select(*model_columns(model)).where(key.in_(row_ids))).mappings():
+            rows[kind, row[key.key]] = dict(row)
+    # A row deleted since it was matched is simply left out
+    return [{'type': kind, 'id': row_id, 'data': rows[kind, row_id]} for kind, row_id in hits if (kind, row_id) in rows]
@@ -0,0 +1,124 @@
+from flask import request
+from . import db
+from .models import User, EmergencyContact, Veterinarian, Dog, Image
+
+
+# Columns each model's to_dict() leaves out
+EXCLUDED_COLUMNS = {
+    User: {'password'},
+    Dog: {'vet_id'},
+}
+
+# User columns that are credentials, only ever returned to the user they belong to
+CREDENTIAL_COLUMNS = {'token', 'token_expiration'}
+
+# The related rows User.to_dict() embeds, keyed by the name it uses for them
+USER_CHILDREN = {
+    'emergency_contacts': EmergencyContact,
+    'veterinarians': Veterinarian,
+    'dogs': Dog,
+    'images': Image,
+}
+
+
+class InvalidFields(ValueError):
+    """Raised when ``?fields=`` or ``?include=`` names something a resource does not have."""
+
+
+def model_columns(model, names=None, credentials=False):
+    """The columns ``model.to_dict()`` returns, narrowed to ``names`` plus the primary key.
+
+    A user's CREDENTIAL_COLUMNS are left out unless ``credentials`` is true,
+    which is only for serializing the caller's own row.
+    """
+    excluded = EXCLUDED_COLUMNS.get(model, set())
+    if model is User and not credentials:
+        excluded = excluded | CREDENTIAL_COLUMNS
+    columns = [column for column in model.__table__.c if column.key not in excluded]
+    if names is None:
+        return columns
+    unknown = set(names) - {column.key for column in columns}
+    if unknown:
+        raise InvalidFields(f"Unknown field(s): {', '.join(sorted(unknown))}")
+    # The primary key is always returned; pagination and embedding rely on it
+    return [column for column in columns if column.key in names or column.primary_key]
+
+
+def select_columns(model, names=None):
+    """A Core select of exactly the columns ``model.to_dict()`` returns, skipping ORM hydration."""
+    return db.select(*model_columns(model, names))
+
+
+def _split(arg):
+    value = request.args.get(arg)
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def requested_fields(model, credentials=False):
+    """Parse ``?fields=`` into ``{relationship: column names}``, top-level columns under ``None``.
+
+    ``?fields=first_name,dogs.name`` asks for the user's first name and the name
+    of each embedded dog. Anything not mentioned is returned in full.
+    ``credentials`` is passed on to model_columns() for the top-level columns.
+    """
+    fields = {}
+    for name in _split('fields') or []:
+        relationship, _, column = name.rpartition('.')
+        fields.setdefault(relationship or None, set()).add(column)
+    children = USER_CHILDREN if model is User else {}
+    for relationship, names in fields.items():
+        if relationship is not None and relationship not in children:
+            raise InvalidFields(f'Unknown relationship: {relationship}')
+        model_columns(children.get(relationship, model), names, credentials and relationship is None)
+    return fields
+
+
+def requested_includes(fields):
+    """The relationships to embed in users: ``?include=``, else those ``?fields=`` mentions.
+
+    Without either parameter every relationship is embedded, as User.to_dict() does.
+    """
+    include = _split('include')
+    if include is None:
+        if not fields:
+            return list(USER_CHILDREN)
+        return [name for name in USER_CHILDREN if name in fields]
+    unknown = set(include) - set(USER_CHILDREN)
+    if unknown:
+        raise InvalidFields(f"Unknown relationship(s): {', '.join(sorted(unknown))}")
+    return include
+
+
+def select_requested(model):
+    """``select_columns`` narrowed by the request's ``?fields=``."""
+    return select_columns(model, requested_fields(model).get(None))
+
+
+def rows_to_dicts(rows):
+    return [dict(row) for row in rows]
+
+
+def users_to_dicts(rows, include=tuple(USER_CHILDREN), fields={}):
+    """Serialize a batch of user rows the way User.to_dict() does, with one query per relationship.
+
+    Only the relationships in ``include`` are embedded, each narrowed to the
+    columns ``fields`` asks for.
+    """
+    users = rows_to_dicts(rows)
+    user_ids = [user['user_id'] for user in users]
+    for name in include:
+        model = USER_CHILDREN[name]
+        children = {user_id: [] for user_id in user_ids}
+        if user_ids:
+            query = (select_columns(model, fields.get(name))
+                     .add_columns(model.user_id.label('_owner'))
+                     .where(model.user_id.in_(user_ids))
+                     .order_by(*model.__table__.primary_key))
+            for child in db.session.execute(query).mappings():
+                child = dict(child)
+                children[child.pop('_owner')].append(child)
+        for user in users:
+            user[name] = children[user['user_id']]
+    return users
@@ -0,0 +1,48 @@
+import fcntl
+import mmap
+import os
+from contextlib import contextmanager
+from threading import Lock
+
+
+class SharedMap:
+    """A file of ``size`` bytes memory-mapped by every worker process on the host.
+
+    Each process maps the file itself the first time it is used, so workers
+    forked from a preloaded app never share the parent's mapping.
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._lock = Lock()
+        self._pid = None
+
+    def _open(self):
+        # flock only excludes separate open file descriptions, so each process opens its own
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(fd).st_size < self.size:
+                os.ftruncate(fd, self.size)
+            self._fd = fd
+            self._map = mmap.mmap(fd, self.size)
+            self._pid = os.getpid()
+
+    @property
+    def map(self):
+        """The mapping, for reads and single aligned writes that need no lock."""
+        self._open()
+        return self._map
+
+    @contextmanager
+    def locked(self):
+        """Yield the mapping while holding it against every other thread and process."""
+        self._open()
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield self._map
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
@@ -0,0 +1,51 @@
+import os
+import tempfile
+from flask import current_app
+from werkzeug.utils import import_string
+
+
+# Directory under UPLOAD_FOLDER where uploads are staged until they are stored
+TEMP_DIR = 'tmp'
+
+
+class LocalStorage:
+    """Stores files under ``UPLOAD_FOLDER`` and serves them from ``MEDIA_URL``.
+
+    Any class with the same methods can be plugged in through the
+    ``STORAGE_BACKEND`` setting, e.g. one that pushes to an object store.
+    """
+
+    def __init__(self, config):
+        self.root = config['UPLOAD_FOLDER']
+        self.media_url = config['MEDIA_URL']
+        # Temporary files live next to the stored ones so saving them is a rename
+        self.temp_dir = os.path.join(self.root, TEMP_DIR)
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    def temp_file(self):
+        """Return an open, writable ``(file, path)`` pair for staging new content."""
+        fd, path = tempfile.mkstemp(dir=self.temp_dir)
+        return os.fdopen(fd, 'w+b'), path
+
+    def exists(self, key):
+        return os.path.exists(os.path.join(self.root, key))
+
+    def save(self, key, path):
+        """Move the staged file at ``path`` to ``key``."""
+        destination = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(path, destination)
+
+    def open(self, key):
+        return open(os.path.join(self.root, key), 'rb')
+
+    def url(self, key):
+        return self.media_url + key
+
+
+def get_storage():
+    storage = current_app.extensions.get('storage')
+    if storage is None:
+        backend = import_string(current_app.config['STORAGE_BACKEND'])
+        storage = current_app.extensions.setdefault('storage', backend(current_app.config))
+    return storage
@@ -0,0 +1,137 @@
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import REGCLASS
+from sqlalchemy.orm import Session
+from . import db
+from .models import utcnow, User, EmergencyContact, Veterinarian, Dog, Image, Change
+from .serializers import model_columns
+
+
+DEFAULT_SYNC_LIMIT = 1000
+MAX_SYNC_LIMIT = 5000
+
+# Every model clients keep an offline copy of, by table name; each has a user_id owner column
+SYNCED_MODELS = {model.__tablename__: model for model in (User, EmergencyContact, Veterinarian, Dog, Image)}
+
+# Advisory locks held on PostgreSQL by the transactions that are logging changes
+pg_locks = db.table('pg_locks', db.column('locktype'), db.column('database'), db.column('classid'),
+                    db.column('objid'), db.column('objsubid'))
+
+
+def lock_change_log(connection):
+    """Mark the current transaction as one whose logged changes may still commit.
+
+    Sequence numbers are handed out when a change is logged, not when it
+    commits, so a later number can become visible while an earlier one is
+    still uncommitted. On PostgreSQL each transaction that logs changes first
+    takes a shared advisory lock keyed on the sequence's current value, below
+    every number it goes on to use, and changes_since() serves no number above
+    the smallest key held. Shared locks never wait for each other, so writers
+    are not serialized. SQLite lets one transaction write at a time anyway.
+    """
+    if connection.dialect.name == 'postgresql':
+        sequence = db.cast(db.func.pg_get_serial_sequence(Change.__tablename__, Change.seq.key), REGCLASS)
+        key = db.func.coalesce(db.func.pg_sequence_last_value(sequence), 0)
+        connection.execute(db.select(db.func.pg_advisory_xact_lock_shared(key)))
+
+
+def _settled_seq():
+    """The sequence number up to which every logged change has committed or rolled back.
+
+    PostgreSQL only, and None while no transaction is logging changes. It is a
+    subquery so that it is read after the snapshot of the statement that reads
+    the changes: anything committed in that snapshot was numbered before the
+    locks were looked at.
+    """
+    # pg_advisory_xact_lock_shared(bigint) shows up split into classid and objid, with objsubid 1
+    key = db.cast(pg_locks.c.classid, db.BigInteger).op('<<')(32).op('|')(db.cast(pg_locks.c.objid, db.BigInteger))
+    database = db.select(db.column('oid')).select_from(db.table('pg_database')).where(
+        db.column('datname') == db.func.current_database()).scalar_subquery()
+    return db.select(db.func.min(key)).where(
+        pg_locks.c.locktype == 'advisory', pg_locks.c.objsubid == 1, pg_locks.c.database == database).scalar_subquery()
+
+
+def record_changes(connection, model, rows, deleted=False):
+    """Append ``(row_id, owner user_id)`` pairs of ``model`` to the change log.
+
+    Writes that bypass the unit of work (multi-row INSERTs, Core UPDATEs) call
+    this themselves; everything flushed through the session is logged automatically.
+    """
+    now = utcnow()
+    values = [
+        {'table_name': model.__tablename__, 'row_id': row_id, 'user_id': user_id, 'deleted': deleted, 'changed_at': now}
+        for row_id, user_id in rows
+    ]
+    if values:
+        lock_change_log(connection)
+        connection.execute(Change.__table__.insert(), values)
+
+
+@event.listens_for(Session, 'after_flush')
+def log_flushed_changes(session, flush_context):
+    # Runs inside the flush's transaction, so a change is logged if and only if it commits
+    modified = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    for objects, deleted in ((session.new, False), (modified, False), (session.deleted, True)):
+        grouped = {}
+        for obj in objects:
+            if type(obj).__tablename__ in SYNCED_MODELS:
+                grouped.setdefault(type(obj), []).append((obj.__mapper__.primary_key_from_instance(obj)[0], obj.user_id))
+        for model, rows in grouped.items():
+            record_changes(session.connection(), model, rows, deleted)
+
+
+def log_existing_rows():
+    """Log every current row once, for rows written before, or around, the change log."""
+    lock_change_log(db.session.connection())
+    for name, model in SYNCED_MODELS.items():
+        key = model.__table__.primary_key.columns[0]
+        rows = db.select(db.literal(name), key, model.user_id, db.false(), db.func.coalesce(model.updated_at, utcnow()))
+        db.session.execute(Change.__table__.insert().from_select(['table_name', 'row_id', 'user_id', 'deleted', 'changed_at'], rows))
+
+
+def changes_since(cursor, limit, user):
+    """The net effect of the change log after ``cursor``, as seen by ``user``.
+
+    Admins see every change and other users only changes to rows they own.
+    Rows changed several times in the window are returned once, in their
+    current state, and rows deleted in it become tombstones. ``cursor`` in the
+    result is the sequence number to pass back as ``?since=`` next time.
+
+    Changes are only served up to the point where every earlier one has
+    committed or rolled back (see lock_change_log()), so no later page can
+    contain a change from before ``cursor``.
+    """
+    query = db.select(Change.seq, Change.table_name, Change.row_id, Change.deleted).where(Change.seq > cursor)
+    if db.session.get_bind(Change).dialect.name == 'postgresql':
+        query = query.where(Change.seq <= db.func.coalesce(_settled_seq(), Change.seq))
+    if not user.is_admin:
+        query = query.where(Change.user_id == user.user_id)
+    entries = db.session.execute(query.order_by(Change.seq).limit(limit + 1)).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Only the last change to each row in the window matters
+    latest = {}
+    for seq, table_name, row_id, deleted in entries:
+        latest[table_name, row_id] = deleted
+
+    changes = {name: [] for name in SYNCED_MODELS}
+    tombstones = {name: [] for name in SYNCED_MODELS}
+    upserts = {name: [] for name in SYNCED_MODELS}
+    for (table_name, row_id), deleted in latest.items():
+        (tombstones if deleted else upserts)[table_name].append(row_id)
+
+    for name, row_ids in upserts.items():
+        if not row_ids:
+            continue
+        model = SYNCED_MODELS[name]
+        key = model.__table__.primary_key.columns[0]
+        query = db.select(*model_columns(model)).where(key.in_(sorted(row_ids))).order_by(key)
+        # A row deleted after this window is simply absent; its tombstone comes on a later page
+        changes[name] = [dict(row) for row in db.session.execute(query).mappings()]
+
+    return {
+        'cursor': entries[-1].seq if entries else cursor,
+        'has_more': has_more,
+        'changes': changes,
+        'deleted': tombstones,
+    }
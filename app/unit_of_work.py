@@ -0,0 +1,88 @@
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from . import db
+
+
+def commit():
+    """Commit the session, or stage the changes until the end of the current request.
+
+    Inside a request the pending changes are flushed (so primary keys and defaults
+    are available) and a single commit happens once the response is ready, or a
+    rollback if the request failed. Outside a request (shell, CLI) this commits now.
+    """
+    if has_request_context():
+        db.session.flush()
+        g.pending_commit = True
+    else:
+        db.session.commit()
+
+
+def on_commit(callback):
+    """Run ``callback`` once the current unit of work has been committed.
+
+    Inside a request that is the request's commit, which this schedules if no
+    write has yet; callers may register before they call commit(). Outside a
+    request it is the session's next commit, or now if no transaction is open.
+    Either way a rollback discards the callback.
+    """
+    if has_request_context():
+        g.pending_commit = True
+        g.setdefault('commit_callbacks', []).append(callback)
+    elif db.session().in_transaction():
+        db.session.info.setdefault('commit_callbacks', []).append(callback)
+    else:
+        callback()
+
+
+@event.listens_for(Session, 'after_commit')
+def remember_commit(session):
+    session.info['callbacks_committed'] = True
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def run_commit_callbacks(session, transaction):
+    # Savepoints end here too; only the outermost transaction's end settles the callbacks
+    committed = session.info.pop('callbacks_committed', False)
+    if transaction.parent is not None:
+        return
+    callbacks = session.info.pop('commit_callbacks', [])
+    if committed:
+        for callback in callbacks:
+            callback()
+
+
+def commit_request(response):
+    if not g.pop('pending_commit', False):
+        return response
+    callbacks = g.pop('commit_callbacks', [])
+    if response.status_code >= 400:
+        db.session.rollback()
+        return response
+    db.session.commit()
+    for callback in callbacks:
+        callback()
+    return response
+
+
+def init_app(app):
+    app.after_request(commit_request)
+
+
+class Savepoint:
+    """Part of the current request's unit of work that can be undone on its own.
+
+    Rolling back discards the writes made since the savepoint together with the
+    on_commit callbacks they registered; releasing keeps both for the request's commit.
+    """
+
+    def __init__(self):
+        self._transaction = db.session.begin_nested()
+        self._callbacks = len(g.get('commit_callbacks', []))
+
+    def release(self):
+        self._transaction.commit()
+
+    def rollback(self):
+        self._transaction.rollback()
+        del g.get('commit_callbacks', [])[self._callbacks:]
@@ -0,0 +1,165 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from flask import Request, current_app
+from . import db
+from .models import Image
+from .storage import get_storage
+from .unit_of_work import on_commit
+from .response_cache import bump_version
+from .sync import record_changes
+from .events import queue_rows
+
+
+# Accepted upload types and the extension their original is stored under
+IMAGE_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+}
+
+# What Pillow calls each accepted type once it has read the file
+IMAGE_FORMATS = {
+    'image/jpeg': 'JPEG',
+    'image/png': 'PNG',
+    'image/gif': 'GIF',
+    'image/webp': 'WEBP',
+}
+
+# Bounding boxes of the resized copies clients display instead of the original
+VARIANTS = {
+    'thumbnail': (320, 320),
+    'web': (1600, 1600),
+}
+
+_variant_executor_lock = Lock()
+
+
+def get_variant_executor():
+    # Started on first use; a forked worker drops the parent's (dead) threads, see dispose_pools()
+    with _variant_executor_lock:
+        executor = current_app.extensions.get('image_variants')
+        if executor is None:
+            executor = current_app.extensions['image_variants'] = ThreadPoolExecutor(
+                max_workers=current_app.config['IMAGE_VARIANT_WORKERS'], thread_name_prefix='image-variants')
+    return executor
+
+
+class HashingFile:
+    """A staged upload that computes its SHA-256 while the form parser writes it."""
+
+    def __init__(self, storage):
+        self._file, self.path = storage.temp_file()
+        self._hash = hashlib.sha256()
+
+    def write(self, data):
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def close(self):
+        self._file.close()
+        # Still here only if the upload was a duplicate or never stored
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Stream file parts straight to the storage's staging area instead of memory
+        return HashingFile(get_storage())
+
+
+def init_app(app):
+    app.request_class = UploadRequest
+
+
+def original_key(content_hash, extension):
+    return f'{content_hash[:2]}/{content_hash}{extension}'
+
+
+def variant_key(content_hash, name):
+    return f'{content_hash[:2]}/{content_hash}_{name}.jpg'
+
+
+def verify_upload(upload):
+    """Whether the staged ``upload`` decodes as an image of the type the client declared."""
+    from PIL import Image as Picture
+
+    staged = upload.stream
+    staged.flush()
+    try:
+        with Picture.open(staged.path) as picture:
+            picture.verify()
+            return picture.format == IMAGE_FORMATS[upload.mimetype]
+    except Exception:
+        # Pillow raises a variety of errors for truncated, corrupt or oversized files
+        return False
+
+
+def store_upload(upload):
+    """Store an uploaded image under its content hash and return ``(content_hash, key)``.
+
+    Identical files are only stored once.
+    """
+    staged = upload.stream
+    staged.flush()
+    content_hash = staged.hexdigest()
+    key = original_key(content_hash, IMAGE_TYPES[upload.mimetype])
+    storage = get_storage()
+    if not storage.exists(key):
+        storage.save(key, staged.path)
+    return content_hash, key
+
+
+def variant_urls(content_hash):
+    """URLs of the already generated variants of ``content_hash``, or None if any are missing."""
+    storage = get_storage()
+    keys = {name: variant_key(content_hash, name) for name in VARIANTS}
+    if not all(storage.exists(key) for key in keys.values()):
+        return None
+    return {f'{name}_url': storage.url(key) for name, key in keys.items()}
+
+
+def schedule_variants(content_hash, key):
+    # Wait for the image row to be committed so the worker's UPDATE can see it
+    app = current_app._get_current_object()
+    on_commit(lambda: get_variant_executor().submit(generate_variants, app, content_hash, key))
+
+
+def generate_variants(app, content_hash, key):
+    """Resize the original at ``key`` and record the variant URLs on every image with its hash."""
+    # Pillow is only needed by the workers that build variants
+    from PIL import Image as Picture, ImageOps
+
+    with app.app_context():
+        try:
+            storage = get_storage()
+            urls = {}
+            with storage.open(key) as original, Picture.open(original) as picture:
+                picture = ImageOps.exif_transpose(picture).convert('RGB')
+                for name, size in VARIANTS.items():
+                    variant = picture.copy()
+                    variant.thumbnail(size)
+                    staged, path = storage.temp_file()
+                    with staged:
+                        variant.save(staged, 'JPEG', quality=85, optimize=True)
+                    storage.save(variant_key(content_hash, name), path)
+                    urls[f'{name}_url'] = storage.url(variant_key(content_hash, name))
+            updated = db.session.execute(
+                db.update(Image).where(Image.content_hash == content_hash).values(**urls).returning(Image.image_id, Image.user_id)
+            ).all()
+            record_changes(db.session.connection(), Image, updated)
+            # Clients waiting on /events learn their thumbnails are ready
+            queue_rows(Image, [image_id for image_id, _ in updated])
+            db.session.commit()
+            bump_version(Image.__tablename__)
+        except Exception:
+            app.logger.exception('Could not generate variants for image %s', content_hash)
@@ -0,0 +1,173 @@
+"""Drive every API route with concurrent clients and report latency as JSON.
+
+Run with ``python -m benchmarks.load``. Without ``--url`` it seeds DATABASE_URL
+(a fresh SQLite file by default) with ``--users`` synthetic users and serves the
+app in-process; with ``--url`` it targets a server whose database was seeded by
+``benchmarks.seed`` with the same ``--users``. DELETE routes and uploads are
+left out so repeated runs see the same data.
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def scenarios(users):
+    """(name, method, path factory, auth, body factory) for every route exercised."""
+    dogs = users * 2
+    images = users * 10
+    rand = random.randint
+
+    def dog():
+        return {'name': 'Bench', 'breed': 'Mixed', 'altered': True}
+
+    return [
+        ('list users', 'GET', lambda: '/users?limit=50', None, None),
+        ('get user', 'GET', lambda: f'/users/{rand(1, users)}', None, None),
+        ('get me', 'GET', lambda: '/users/me', 'token', None),
+        ('update me', 'PUT', lambda: '/users/me', 'token', lambda: {'phone_number': f'555-{rand(0, 9999):04d}'}),
+        ('create user', 'POST', lambda: '/users', None, lambda: {'first_name': 'B', 'last_name': 'B', 'email': f'bench-{time.time_ns()}-{rand(0, 10**9)}@example.com', 'password': 'password'}),
+        ('login', 'GET', lambda: '/login', 'basic', None),
+        ('list dogs', 'GET', lambda: '/dogs?limit=100', None, None),
+        ('get dog', 'GET', lambda: f'/dogs/{rand(1, dogs)}', 'token', None),
+        ('dogs by user', 'GET', lambda: f'/dogs/user/{rand(1, users)}', 'token', None),
+        ('create dog', 'POST', lambda: '/dogs', 'token', dog),
+        ('bulk create dogs', 'POST', lambda: '/dogs/bulk', 'token', lambda: [dog() for _ in range(50)]),
+        ('update dog', 'PUT', lambda: f'/dogs/{rand(1, dogs)}', 'token', lambda: {'medications': 'None'}),
+        ('list images', 'GET', lambda: '/images?limit=100', None, None),
+        ('get image', 'GET', lambda: f'/images/{rand(1, images)}', 'token', None),
+        ('images by client', 'GET', lambda: f'/images/client/{rand(1, users)}', 'token', None),
+        ('create image', 'POST', lambda: '/images', 'token', lambda: {'image_url': 'https://images.example.com/new.jpg'}),
+        ('list vets', 'GET', lambda: '/veterinarians?limit=100', 'token', None),
+        ('get vet', 'GET', lambda: f'/veterinarians/{rand(1, users)}', 'token', None),
+        ('vet by user', 'GET', lambda: f'/veterinarians/user/{rand(1, users)}', 'token', None),
+        ('update vet', 'PUT', lambda: f'/veterinarians/{rand(1, users)}', 'token', lambda: {'clinic': 'Bench Clinic'}),
+        ('create vet', 'POST', lambda: '/veterinarians', 'token', lambda: {'name': 'Dr. Bench'}),
+        ('list emergency contacts', 'GET', lambda: '/emergency-contacts?limit=100', 'token', None),
+        ('get emergency contact', 'GET', lambda: f'/emergency-contacts/{rand(1, users)}', 'token', None),
+        ('emergency contact by user', 'GET', lambda: f'/emergency-contacts/user/{rand(1, users)}', 'token', None),
+        ('update emergency contact', 'PUT', lambda: f'/emergency-contacts/{rand(1, users)}', 'token', lambda: {'phone_number': '555-0000'}),
+        ('create emergency contact', 'POST', lambda: '/emergency-contacts', 'token', lambda: {'first_name': 'Bench'}),
+    ]
+
+
+def call(base_url, method, path, headers, body):
+    """Make one request and return (latency seconds, status, queries reported in Server-Timing)."""
+    data = None
+    if body is not None:
+        data = json.dumps(body).encode()
+        headers = {**headers, 'Content-Type': 'application/json'}
+    req = urllib.request.Request(base_url + path, data=data, headers=headers, method=method)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req) as response:
+            response.read()
+            status, timing = response.status, response.headers.get('Server-Timing', '')
+    except urllib.error.HTTPError as error:
+        error.read()
+        status, timing = error.code, error.headers.get('Server-Timing', '')
+    elapsed = time.perf_counter() - start
+    match = re.search(r'(\d+) queries', timing)
+    return elapsed, status, int(match.group(1)) if match else None
+
+
+def run_scenario(base_url, scenario, users, requests, concurrency):
+    from benchmarks.seed import email, token, PASSWORD
+
+    name, method, path, auth, body = scenario
+
+    def one(_):
+        user_id = random.randint(1, users)
+        headers = {}
+        if auth == 'token':
+            headers['Authorization'] = f'Bearer {token(user_id)}'
+        elif auth == 'basic':
+            credentials = base64.b64encode(f'{email(user_id)}:{PASSWORD}'.encode()).decode()
+            headers['Authorization'] = f'Basic {credentials}'
+        return call(base_url, method, path(), headers, body() if body else None)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in results)
+    percentiles = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    queries = [count for _, _, count in results if count is not None]
+    return {
+        'method': method,
+        'requests': requests,
+        'errors': sum(1 for _, status, _ in results if status >= 400),
+        'p50_ms': round(percentiles[49], 2),
+        'p95_ms': round(percentiles[94], 2),
+        'p99_ms': round(percentiles[98], 2),
+        'throughput_rps': round(requests / wall, 1),
+        'queries_per_request': round(statistics.mean(queries), 2) if queries else None,
+    }
+
+
+def serve_in_process(users):
+    """Seed a fresh database and serve the app on a random local port."""
+    if 'DATABASE_URL' not in os.environ:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    from werkzeug.serving import make_server
+    from app import create_app, db
+    from benchmarks.seed import seed
+
+    app = create_app()
+    # The load generator is a single client IP hammering writes and logins
+    app.config['RATELIMIT_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        seed(users)
+    # Keep the per-request access log out of the report
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Base URL of an already running, already seeded server')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per route')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--route', action='append', help='Only run the named scenario(s)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the randomly chosen ids')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    base_url = args.url.rstrip('/') if args.url else serve_in_process(args.users)
+    results = {}
+    for scenario in scenarios(args.users):
+        if args.route and scenario[0] not in args.route:
+            continue
+        results[scenario[0]] = run_scenario(base_url, scenario, args.users, args.requests, args.concurrency)
+
+    report = json.dumps({
+        'users': args.users,
+        'requests_per_route': args.requests,
+        'concurrency': args.concurrency,
+        'results': results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Seed the database with a reproducible synthetic kennel.
+
+Run with ``python -m benchmarks.seed [--users N]`` against DATABASE_URL. Every
+user gets a few dogs, a vet, an emergency contact and a photo timeline, all
+written with chunked executemany INSERTs, so a million-plus rows load in
+under a minute even on SQLite.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, text
+from werkzeug.security import generate_password_hash
+from app import create_app, db
+from app.models import User, EmergencyContact, Veterinarian, Dog, Image
+from app.sync import log_existing_rows
+from app.search import index_existing_rows
+
+
+PASSWORD = 'password'
+CHUNK_SIZE = 10000
+
+DOGS_PER_USER = 2
+IMAGES_PER_USER = 10
+
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn']
+LAST_NAMES = ['Smith', 'Garcia', 'Nguyen', 'Okafor', 'Kowalski', 'Rossi', 'Haddad', 'Kim', 'Lopez', 'Berg']
+DOG_NAMES = ['Biscuit', 'Luna', 'Max', 'Pepper', 'Scout', 'Mochi', 'Bear', 'Daisy', 'Ziggy', 'Olive']
+BREEDS = ['Labrador', 'Beagle', 'Poodle', 'Boxer', 'Mixed', 'Corgi', 'Husky', 'Dachshund']
+CITIES = [('Chicago', 'IL'), ('Austin', 'TX'), ('Denver', 'CO'), ('Portland', 'OR'), ('Raleigh', 'NC')]
+
+
+def email(user_id):
+    return f'user{user_id}@example.com'
+
+
+def token(user_id):
+    return f'{user_id:032x}'
+
+
+def insert_chunked(model, rows):
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            db.session.execute(insert(model.__table__), chunk)
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(insert(model.__table__), chunk)
+        count += len(chunk)
+    return count
+
+
+def seed(users, rng_seed=0):
+    """Insert ``users`` users and their related rows; user ids run from 1 to ``users``."""
+    rng = random.Random(rng_seed)
+    # Hashing is deliberately slow, so every synthetic user shares one hash
+    password = generate_password_hash(PASSWORD)
+    now = datetime.now(timezone.utc)
+    expiration = now + timedelta(days=365)
+
+    def user_rows():
+        for user_id in range(1, users + 1):
+            city, state = rng.choice(CITIES)
+            yield {
+                'user_id': user_id, 'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES),
+                'street1': f'{rng.randint(1, 9999)} Main St', 'city': city, 'state': state, 'zip': rng.randint(10000, 99999),
+                'email': email(user_id), 'phone_number': f'555-{rng.randint(0, 9999):04d}', 'date_created': now,
+                'password': password, 'is_admin': user_id == 1, 'token': token(user_id), 'token_expiration': expiration,
+                'updated_at': now,
+            }
+
+    def contact_rows():
+        for user_id in range(1, users + 1):
+            yield {
+                'ec_id': user_id, 'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES),
+                'phone_number': f'555-{rng.randint(0, 9999):04d}', 'user_id': user_id, 'updated_at': now,
+            }
+
+    def vet_rows():
+        for user_id in range(1, users + 1):
+            city, state = rng.choice(CITIES)
+            yield {
+                'vet_id': user_id, 'name': f'Dr. {rng.choice(LAST_NAMES)}', 'clinic': f'{city} Animal Hospital',
+                'city': city, 'state': state, 'user_id': user_id, 'updated_at': now,
+            }
+
+    def dog_rows():
+        for dog_id in range(1, users * DOGS_PER_USER + 1):
+            user_id = (dog_id - 1) // DOGS_PER_USER + 1
+            yield {
+                'dog_id': dog_id, 'name': rng.choice(DOG_NAMES), 'breed': rng.choice(BREEDS),
+                'sex': rng.choice(['M', 'F']), 'altered': rng.random() < 0.8, 'crated': rng.random() < 0.5,
+                'daily_updates': rng.random() < 0.5, 'user_id': user_id, 'vet_id': user_id, 'updated_at': now,
+            }
+
+    def image_rows():
+        for image_id in range(1, users * IMAGES_PER_USER + 1):
+            user_id = (image_id - 1) // IMAGES_PER_USER + 1
+            yield {
+                'image_id': image_id, 'image_url': f'https://images.example.com/{image_id}.jpg',
+                'date_added': now - timedelta(minutes=image_id), 'client_user_id': user_id, 'user_id': 1,
+                'dog_id': (user_id - 1) * DOGS_PER_USER + rng.randint(1, DOGS_PER_USER), 'updated_at': now,
+            }
+
+    counts = {}
+    for name, model, rows in (('users', User, user_rows()), ('emergency_contacts', EmergencyContact, contact_rows()),
+                              ('veterinarians', Veterinarian, vet_rows()), ('dogs', Dog, dog_rows()),
+                              ('images', Image, image_rows())):
+        counts[name] = insert_chunked(model, rows)
+        if db.engine.dialect.name == 'postgresql':
+            # Ids were inserted explicitly, so move the sequence past them for later inserts
+            table = model.__table__
+            key = table.primary_key.columns[0].name
+            db.session.execute(text(f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', '{key}'), (SELECT MAX({key}) FROM \"{table.name}\"))"))
+    # Executemany INSERTs bypass the session, so log and index the rows in one pass
+    log_existing_rows()
+    index_existing_rows()
+    db.session.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        db.create_all()
+        start = time.perf_counter()
+        counts = seed(args.users, args.seed)
+        print(json.dumps({'rows': counts, 'seconds': round(time.perf_counter() - start, 2)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
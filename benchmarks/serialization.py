@@ -0,0 +1,58 @@
+"""Compare rows/sec of the ORM to_dict() path against the Core row serializers.
+
+Run with ``python -m benchmarks.serialization [--rows N]``; uses an in-memory
+SQLite database unless DATABASE_URL is set.
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from sqlalchemy import insert
+from app import create_app, db
+from app.models import User, Dog, Image
+from app.serializers import select_columns, rows_to_dicts, users_to_dicts
+
+
+def seed(rows):
+    users = max(rows // 10, 1)
+    db.session.execute(insert(User), [{'first_name': f'User {i}', 'email': f'user{i}@example.com'} for i in range(users)])
+    db.session.execute(insert(Dog), [{'name': f'Dog {i}', 'breed': 'Mixed', 'user_id': i % users + 1} for i in range(rows)])
+    db.session.execute(insert(Image), [{'image_url': f'https://example.com/{i}.jpg', 'user_id': i % users + 1, 'client_user_id': i % users + 1} for i in range(rows)])
+    db.session.commit()
+    return users
+
+
+def measure(fn):
+    start = time.perf_counter()
+    count = len(fn())
+    elapsed = time.perf_counter() - start
+    db.session.expunge_all()
+    return {'rows': count, 'seconds': round(elapsed, 4), 'rows_per_sec': round(count / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        db.create_all()
+        seed(args.rows)
+        results = {}
+        for name, model in (('dogs', Dog), ('images', Image)):
+            results[name] = {
+                'orm_to_dict': measure(lambda: [obj.to_dict() for obj in db.session.execute(db.select(model)).scalars()]),
+                'core_rows': measure(lambda: rows_to_dicts(db.session.execute(select_columns(model)).mappings())),
+            }
+        results['users'] = {
+            'orm_to_dict': measure(lambda: [user.to_dict() for user in db.session.execute(db.select(User).options(*User.loader_options())).scalars()]),
+            'core_rows': measure(lambda: users_to_dicts(db.session.execute(select_columns(User)).mappings().all())),
+        }
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Measure cold start in fresh interpreters and check it against a time budget.
+
+Run with ``python -m benchmarks.startup [--runs N] [--budget-ms MS]``. Each run
+starts a new Python process that imports the app package, calls create_app()
+and serves one request, timing each step. The JSON report gives the median of
+every step; the command exits non-zero when the median time to the first
+response is over budget, or when a server start imported a module that only
+the command line needs.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+# Imported only by ``flask`` commands; a server that loads them starts slower for nothing
+CLI_ONLY_MODULES = ('flask_migrate', 'alembic', 'app.importer')
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+response = application.test_client().get('/')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'total_ms': (served - start) * 1000,
+    'cli_modules': [name for name in %r if name in sys.modules],
+}))
+''' % (CLI_ONLY_MODULES,)
+
+
+def probe():
+    env = {**os.environ, 'DATABASE_URL': os.environ.get('DATABASE_URL', 'sqlite://')}
+    output = subprocess.run([sys.executable, '-c', PROBE], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def slowest_imports(count):
+    """The ``count`` modules with the largest self time under ``python -X importtime``."""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app; app.create_app()'],
+                            check=True, capture_output=True, text=True).stderr
+    timings = []
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            own, _, name = line[len('import time:'):].split('|')
+            if own.strip().isdigit():
+                timings.append((int(own), name.strip()))
+    return [{'module': name, 'ms': round(own / 1000, 2)} for own, name in sorted(timings, reverse=True)[:count]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1000, help='Allowed median time to the first response')
+    parser.add_argument('--top', type=int, default=10, help='How many of the slowest imports to list')
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.runs)]
+    steps = ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms')
+    report = {step: round(statistics.median(run[step] for run in runs), 1) for step in steps}
+    report['budget_ms'] = args.budget_ms
+    report['cli_modules_loaded'] = sorted({name for run in runs for name in run['cli_modules']})
+    report['slowest_imports'] = slowest_imports(args.top)
+    print(json.dumps(report, indent=2))
+
+    if report['total_ms'] > args.budget_ms:
+        sys.exit(f"Cold start took {report['total_ms']} ms, over the {args.budget_ms} ms budget")
+    if report['cli_modules_loaded']:
+        sys.exit(f"Starting the server imported {', '.join(report['cli_modules_loaded'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,5 +3,85 @@ import os
 #get the base directory of this folder
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+
+def engine_options(url):
+    """Connection pool settings for the engine at ``url``, from the DB_POOL_* environment variables."""
+    options = {
+        # Test connections on checkout and replace them before the server or a proxy drops them
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    # SQLite's pools have no size limits to configure
+    if not url.startswith('sqlite'):
+        options['pool_size'] = int(os.environ.get('DB_POOL_SIZE', 5))
+        options['max_overflow'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+        options['pool_timeout'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    return options
+
+
+def shared_path(name):
+    """Where the memory-mapped file ``name`` that a host's workers share lives, in RAM when /dev/shm exists."""
+    return os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else basedir, f'luckypaws-{name}')
+
+
 class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'app.db')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Comma-separated read replica URLs; read-only GETs are spread across them, and a client
+    # that just wrote keeps reading from the primary for DB_REPLICA_STICKY_SECONDS
+    DATABASE_REPLICA_URLS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+    SQLALCHEMY_BINDS = {f'replica{i}': {'url': url, **engine_options(url)} for i, url in enumerate(DATABASE_REPLICA_URLS)}
+    DB_REPLICA_STICKY_SECONDS = float(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+    DB_REPLICA_STICKY_PATH = os.environ.get('DB_REPLICA_STICKY_PATH') or shared_path('recent-writes')
+    # How long an API token stays valid and how many verified tokens each worker keeps in memory;
+    # a write to any user invalidates them in every worker on the host (other hosts wait for the TTL)
+    TOKEN_LIFETIME = int(os.environ.get('TOKEN_LIFETIME', 24 * 60 * 60))
+    TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 1024))
+    TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 60))
+    # Where uploaded images and their resized variants are stored and served from
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND') or 'app.storage.LocalStorage'
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(basedir, 'uploads')
+    MEDIA_URL = os.environ.get('MEDIA_URL') or '/media/'
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_UPLOAD_SIZE', 25 * 1024 * 1024))
+    IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS', 2))
+    # Statements slower than this are logged with their SQL
+    SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 500))
+    # Werkzeug hash method and cost; existing hashes are upgraded on the next successful login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    # Each server process hashes in this many processes of its own (0 hashes in the request
+    # thread) and turns requests away once PASSWORD_HASH_QUEUE_LIMIT of its hashes are queued.
+    # Both are per server process: gunicorn's workers already cover every CPU, so one each.
+    # Raise PASSWORD_HASH_WORKERS for `flask import`, which hashes across all of them
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 4))
+    # Token-bucket limits as "<requests>/<seconds>"; the shared backend keeps buckets in a
+    # memory-mapped file so all workers on a host enforce one limit
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND') or 'app.ratelimit.MemoryBackend'
+    RATELIMIT_MEMORY_SIZE = int(os.environ.get('RATELIMIT_MEMORY_SIZE', 100000))
+    RATELIMIT_SHARED_PATH = os.environ.get('RATELIMIT_SHARED_PATH') or shared_path('ratelimit')
+    RATELIMIT_SHARED_SLOTS = int(os.environ.get('RATELIMIT_SHARED_SLOTS', 65536))
+    RATELIMIT_LOGIN_IP = os.environ.get('RATELIMIT_LOGIN_IP') or '20/60'
+    RATELIMIT_LOGIN_ACCOUNT = os.environ.get('RATELIMIT_LOGIN_ACCOUNT') or '10/60'
+    RATELIMIT_WRITE_IP = os.environ.get('RATELIMIT_WRITE_IP') or '300/60'
+    RATELIMIT_WRITE_ACCOUNT = os.environ.get('RATELIMIT_WRITE_ACCOUNT') or '120/60'
+    # Rows `flask import` inserts per transaction
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 5000))
+    # Cached responses of the public list/detail endpoints; per-table versions shared by all
+    # workers on a host invalidate them on every committed write
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND') or 'app.cache.TTLCache'
+    RESPONSE_CACHE_VERSIONS = os.environ.get('RESPONSE_CACHE_VERSIONS') or 'app.response_cache.SharedVersions'
+    RESPONSE_CACHE_SHARED_PATH = os.environ.get('RESPONSE_CACHE_SHARED_PATH') or shared_path('versions')
+    RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+    # Server-sent events for /events; the shared backend keeps recent events in a memory-mapped
+    # ring so every worker on a host streams them and reconnecting clients can replay them
+    EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND') or 'app.events.SharedEvents'
+    EVENTS_SHARED_PATH = os.environ.get('EVENTS_SHARED_PATH') or shared_path('events')
+    EVENTS_REPLAY_SIZE = int(os.environ.get('EVENTS_REPLAY_SIZE', 4096))
+    EVENTS_POLL_SECONDS = float(os.environ.get('EVENTS_POLL_SECONDS', 0.5))
+    EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15))
+    EVENTS_RETRY_MS = int(os.environ.get('EVENTS_RETRY_MS', 3000))
+    # Each open stream holds a worker thread, so keep some of them for other requests
+    EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', 24))
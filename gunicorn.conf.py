@@ -0,0 +1,17 @@
+"""Gunicorn settings, read on their own when ``gunicorn`` is started from this directory.
+
+/events keeps its request open for as long as the client listens, which would
+take a whole sync worker per client. Workers therefore serve requests on
+threads, at most EVENTS_MAX_STREAMS of which hold a stream at a time.
+Override any setting on the command line or in GUNICORN_CMD_ARGS.
+"""
+import os
+
+wsgi_app = 'app:create_app()'
+# Workers fork from a loaded app; each drops the parent's connections on fork, see app.dispose_pools()
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * (os.cpu_count() or 1) + 1))
+worker_class = 'gthread'
+# Keep this above EVENTS_MAX_STREAMS so streams never leave a worker without threads for the API
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
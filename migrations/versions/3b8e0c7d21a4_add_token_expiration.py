@@ -0,0 +1,26 @@
+"""add user.token_expiration
+
+Revision ID: 3b8e0c7d21a4
+Revises: f359d3465d9c
+Create Date: 2026-10-17 09:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8e0c7d21a4'
+down_revision = 'f359d3465d9c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_expiration', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('token_expiration')
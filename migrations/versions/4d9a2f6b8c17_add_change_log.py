@@ -0,0 +1,53 @@
+"""add change log for delta sync
+
+Revision ID: 4d9a2f6b8c17
+Revises: e17b4a9c3d68
+Create Date: 2026-10-17 17:52:14.380912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d9a2f6b8c17'
+down_revision = 'e17b4a9c3d68'
+branch_labels = None
+depends_on = None
+
+
+SYNCED_TABLES = {
+    'user': 'user_id',
+    'emergency_contact': 'ec_id',
+    'veterinarian': 'vet_id',
+    'dog': 'dog_id',
+    'image': 'image_id',
+}
+
+
+def upgrade():
+    op.create_table('change',
+    sa.Column('seq', sa.Integer(), nullable=False),
+    sa.Column('table_name', sa.Text(), nullable=False),
+    sa.Column('row_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('deleted', sa.Boolean(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('seq')
+    )
+    with op.batch_alter_table('change', schema=None) as batch_op:
+        batch_op.create_index('ix_change_user_id_seq', ['user_id', 'seq'], unique=False)
+
+    # Existing rows are logged once so a first sync from zero returns everything
+    for table, key in SYNCED_TABLES.items():
+        op.execute(
+            f'INSERT INTO change (table_name, row_id, user_id, deleted, changed_at) '
+            f"SELECT '{table}', {key}, user_id, FALSE, COALESCE(updated_at, CURRENT_TIMESTAMP) FROM \"{table}\""
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('change', schema=None) as batch_op:
+        batch_op.drop_index('ix_change_user_id_seq')
+
+    op.drop_table('change')
@@ -0,0 +1,54 @@
+"""add foreign key and lookup indexes
+
+Revision ID: 9a41d6c0e5f2
+Revises: 3b8e0c7d21a4
+Create Date: 2026-10-17 10:03:48.915730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a41d6c0e5f2'
+down_revision = '3b8e0c7d21a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_email'), ['email'], unique=True)
+
+    with op.batch_alter_table('emergency_contact', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_emergency_contact_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('veterinarian', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_veterinarian_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('dog', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_dog_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_image_user_id'), ['user_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_image_dog_id'), ['dog_id'], unique=False)
+        batch_op.create_index('ix_image_client_user_id_date_added', ['client_user_id', 'date_added'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.drop_index('ix_image_client_user_id_date_added')
+        batch_op.drop_index(batch_op.f('ix_image_dog_id'))
+        batch_op.drop_index(batch_op.f('ix_image_user_id'))
+
+    with op.batch_alter_table('dog', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_dog_user_id'))
+
+    with op.batch_alter_table('veterinarian', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_veterinarian_user_id'))
+
+    with op.batch_alter_table('emergency_contact', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_emergency_contact_user_id'))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_email'))
@@ -0,0 +1,50 @@
+"""add full-text search index
+
+Revision ID: b83f5c2e9d41
+Revises: 4d9a2f6b8c17
+Create Date: 2026-10-17 18:20:41.265103
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b83f5c2e9d41'
+down_revision = '4d9a2f6b8c17'
+branch_labels = None
+depends_on = None
+
+
+# Same order and columns as app.search.SEARCHED; a document's rowid is row id * 3 + position
+SEARCHED_TABLES = [
+    ('dog', 'dog_id', ['name', 'breed', 'health_conditions', 'allergies', 'medications']),
+    ('user', 'user_id', ['first_name', 'last_name', 'email', 'phone_number']),
+    ('veterinarian', 'vet_id', ['name', 'clinic']),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE TABLE search_index ("
+            "rowid BIGINT PRIMARY KEY, user_id INTEGER, body TEXT NOT NULL, "
+            "document TSVECTOR GENERATED ALWAYS AS "
+            "(to_tsvector('english', regexp_replace(body, '[^[:alnum:]]+', ' ', 'g'))) STORED)"
+        )
+        op.execute("CREATE INDEX ix_search_index_document ON search_index USING GIN (document)")
+    else:
+        op.execute(
+            "CREATE VIRTUAL TABLE search_index USING fts5("
+            "user_id UNINDEXED, body, tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+
+    for position, (table, key, columns) in enumerate(SEARCHED_TABLES):
+        body = " || ' ' || ".join(f"COALESCE({column}, '')" for column in columns)
+        op.execute(
+            f'INSERT INTO search_index (rowid, user_id, body) '
+            f'SELECT {key} * {len(SEARCHED_TABLES)} + {position}, user_id, {body} FROM "{table}"'
+        )
+
+
+def downgrade():
+    op.execute('DROP TABLE search_index')
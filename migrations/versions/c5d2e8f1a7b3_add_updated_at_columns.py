@@ -0,0 +1,30 @@
+"""add updated_at version columns
+
+Revision ID: c5d2e8f1a7b3
+Revises: 9a41d6c0e5f2
+Create Date: 2026-10-17 11:21:07.338164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2e8f1a7b3'
+down_revision = '9a41d6c0e5f2'
+branch_labels = None
+depends_on = None
+
+tables = ('user', 'emergency_contact', 'veterinarian', 'dog', 'image')
+
+
+def upgrade():
+    for table in tables:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    for table in reversed(tables):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
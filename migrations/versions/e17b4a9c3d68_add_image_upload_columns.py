@@ -0,0 +1,32 @@
+"""add image content hash and variant urls
+
+Revision ID: e17b4a9c3d68
+Revises: c5d2e8f1a7b3
+Create Date: 2026-10-17 13:40:52.106493
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e17b4a9c3d68'
+down_revision = 'c5d2e8f1a7b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('thumbnail_url', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('web_url', sa.Text(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_image_content_hash'), ['content_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_image_content_hash'))
+        batch_op.drop_column('web_url')
+        batch_op.drop_column('thumbnail_url')
+        batch_op.drop_column('content_hash')
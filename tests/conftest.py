@@ -0,0 +1,122 @@
+import base64
+import secrets
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event, insert
+from werkzeug.security import generate_password_hash
+from config import Config
+from app import create_app, db
+from app.models import User, EmergencyContact, Veterinarian, Dog, Image
+
+
+PASSWORD = 'password'
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f'sqlite:///{tmp_path / "test.db"}'
+
+
+@pytest.fixture
+def config():
+    """Settings a test module overrides on top of the test configuration."""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, database_url, config):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        SQLALCHEMY_BINDS = {}
+        UPLOAD_FOLDER = str(tmp_path / 'uploads')
+        # Hash in the request thread, cheaply, and keep every backend inside this app
+        PASSWORD_HASH_WORKERS = 0
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+        IMAGE_VARIANT_WORKERS = 1
+        RATELIMIT_ENABLED = False
+        RESPONSE_CACHE_ENABLED = False
+        RESPONSE_CACHE_VERSIONS = 'app.response_cache.LocalVersions'
+        EVENTS_BACKEND = 'app.events.LocalEvents'
+        DB_REPLICA_STICKY_PATH = str(tmp_path / 'recent-writes')
+
+    for key, value in config.items():
+        setattr(TestConfig, key, value)
+    app = create_app(TestConfig)
+    # Requests reuse an app context that is already pushed, so only push one while setting up
+    with app.app_context():
+        # Only the primary; db keeps a metadata for every bind key any earlier app configured
+        db.create_all(bind_key=None)
+    yield app
+    with app.app_context():
+        # A server database outlives the test, so leave it empty
+        if db.engine.dialect.name != 'sqlite':
+            db.drop_all(bind_key=None)
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def capture_queries(app):
+    """A context manager collecting the ``(sql, parameters)`` of every statement run inside it."""
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return counter
+
+
+@pytest.fixture
+def make_user(app):
+    """Insert a user owning ``rows`` dogs, vets, emergency contacts and images; returns its columns."""
+    password_hash = generate_password_hash(PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+
+    def make_user(rows=0, is_admin=False):
+        with app.app_context():
+            return _insert_user(password_hash, rows, is_admin)
+    return make_user
+
+
+def _insert_user(password_hash, rows, is_admin):
+    token = secrets.token_hex(16)
+    user_id = db.session.execute(insert(User).returning(User.user_id), {
+        'first_name': 'Test', 'last_name': 'User', 'email': f'{token}@example.com',
+        'password': password_hash, 'is_admin': is_admin, 'token': token,
+        'token_expiration': datetime.now(timezone.utc) + timedelta(hours=1),
+        'date_created': datetime.now(timezone.utc),
+    }).scalar_one()
+    if rows:
+        for model, values in ((EmergencyContact, {'first_name': 'Contact'}),
+                              (Veterinarian, {'name': 'Vet'}),
+                              (Dog, {'name': 'Rex'})):
+            db.session.execute(insert(model), [{'user_id': user_id, **values} for _ in range(rows)])
+        db.session.execute(insert(Image), [{'user_id': user_id, 'image_url': f'/media/{i}.jpg'} for i in range(rows)])
+    db.session.commit()
+    return SimpleNamespace(**db.session.get(User, user_id).cache_snapshot())
+
+
+def bearer(user):
+    return {'Authorization': f'Bearer {user.token}'}
+
+
+def basic(user, password=PASSWORD):
+    credentials = base64.b64encode(f'{user.email}:{password}'.encode()).decode()
+    return {'Authorization': f'Basic {credentials}'}
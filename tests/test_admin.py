@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import event
+from app import db
+from app.response_cache import get_versions
+from .conftest import bearer
+
+
+def test_users_cannot_make_themselves_admins(client, make_user):
+    user = make_user()
+    response = client.put('/users/me', json={'is_admin': True}, headers=bearer(user))
+    assert response.status_code == 200
+    assert response.json['is_admin'] is False
+    assert client.post('/admin/purge', json={'users': []}, headers=bearer(user)).status_code == 403
+
+
+def test_admins_grant_and_revoke_admin(client, make_user):
+    admin, user = make_user(is_admin=True), make_user()
+    assert client.put(f'/admin/users/{user.user_id}/admin', json={'is_admin': True}, headers=bearer(user)).status_code == 403
+
+    response = client.put(f'/admin/users/{user.user_id}/admin', json={'is_admin': True}, headers=bearer(admin))
+    assert response.json == {'user_id': user.user_id, 'is_admin': True}
+    assert client.get('/admin/token-cache', headers=bearer(user)).status_code == 200
+
+    client.put(f'/admin/users/{user.user_id}/admin', json={'is_admin': False}, headers=bearer(admin))
+    assert client.get('/admin/token-cache', headers=bearer(user)).status_code == 403
+
+
+def test_admin_status_changes_are_validated(client, make_user):
+    admin = make_user(is_admin=True)
+    assert client.put(f'/admin/users/{admin.user_id}/admin', json={'is_admin': False}, headers=bearer(admin)).status_code == 400
+    assert client.put('/admin/users/999/admin', json={'is_admin': True}, headers=bearer(admin)).status_code == 404
+    assert client.put(f'/admin/users/{admin.user_id}/admin', json={'is_admin': 'yes'}, headers=bearer(admin)).status_code == 400
+
+
+def test_purging_an_uploader_invalidates_cached_images(app, client, make_user):
+    app.config['RESPONSE_CACHE_ENABLED'] = True
+    admin, uploader, client_user = make_user(is_admin=True), make_user(), make_user()
+    client.post('/images', json={'image_url': '/media/a.jpg', 'client_user_id': client_user.user_id},
+                headers=bearer(uploader))
+    assert client.get('/images').json[0]['user_id'] == uploader.user_id
+
+    response = client.post('/admin/purge', json={'users': [uploader.user_id]}, headers=bearer(admin))
+    assert response.json['deleted']['image'] == 0
+    assert client.get('/images').json[0]['user_id'] is None
+
+
+@pytest.fixture
+def commit_order(app, monkeypatch):
+    """Record, in order, each database COMMIT and each table version bump."""
+    order = []
+    with app.app_context():
+        versions = get_versions()
+        engine = db.engine
+    bump = versions.bump
+    monkeypatch.setattr(versions, 'bump', lambda table: (order.append(('bump', table)), bump(table)))
+    listener = lambda connection: order.append(('COMMIT',))
+    event.listen(engine, 'commit', listener)
+    yield order
+    event.remove(engine, 'commit', listener)
+
+
+@pytest.mark.parametrize('path, table', [('/dogs/{dog_id}', 'dog'), ('/users/me', 'user')])
+def test_deletes_bump_versions_after_committing(client, make_user, commit_order, path, table):
+    user = make_user()
+    dog_id = client.post('/dogs', json={'name': 'Rex'}, headers=bearer(user)).json['dog_id']
+    commit_order.clear()
+    assert client.delete(path.format(dog_id=dog_id), headers=bearer(user)).status_code == 200
+    assert commit_order.index(('COMMIT',)) < commit_order.index(('bump', table))
@@ -0,0 +1,35 @@
+import pytest
+from app import create_app, db
+from .conftest import bearer
+
+
+@pytest.fixture
+def config(tmp_path):
+    # Table versions in a file, as every worker on a host shares them
+    return {'RESPONSE_CACHE_VERSIONS': 'app.response_cache.SharedVersions',
+            'RESPONSE_CACHE_SHARED_PATH': str(tmp_path / 'versions')}
+
+
+@pytest.fixture
+def other_worker(app):
+    """A client of a second app on the same database and versions file, with a token cache of its own."""
+    other = create_app(type('OtherWorkerConfig', (), dict(app.config)))
+    yield other.test_client()
+    with other.app_context():
+        db.engine.dispose()
+
+
+def test_admin_changes_reach_other_workers(client, make_user, other_worker):
+    admin, user = make_user(is_admin=True), make_user(is_admin=True)
+    assert client.get('/admin/token-cache', headers=bearer(user)).status_code == 200
+
+    other_worker.put(f'/admin/users/{user.user_id}/admin', json={'is_admin': False}, headers=bearer(admin))
+    assert client.get('/admin/token-cache', headers=bearer(user)).status_code == 403
+
+
+def test_deleted_users_are_signed_out_on_other_workers(client, make_user, other_worker):
+    user = make_user()
+    assert client.get('/users/me', headers=bearer(user)).status_code == 200
+
+    other_worker.delete('/users/me', headers=bearer(user))
+    assert client.get('/users/me', headers=bearer(user)).status_code == 401
@@ -0,0 +1,51 @@
+import pytest
+from .conftest import bearer
+
+
+@pytest.fixture
+def config():
+    return {'RATELIMIT_ENABLED': True, 'RATELIMIT_WRITE_IP': '3/60', 'RATELIMIT_WRITE_ACCOUNT': '1000/60'}
+
+
+def test_operations_with_bad_headers_fail_alone(client, make_user):
+    user = make_user()
+    response = client.post('/batch', headers=bearer(user), json={'requests': [
+        {'method': 'GET', 'path': '/dogs', 'headers': 'x'},
+        {'method': 'GET', 'path': '/dogs', 'headers': {'X-Count': 1}},
+        {'method': 'GET', 'path': '/dogs', 'headers': {'Accept': 'application/json'}},
+    ]})
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json['results']] == [400, 400, 200]
+
+
+def test_each_write_is_charged_to_the_ip_limit(client, make_user):
+    user = make_user()
+    # The batch itself takes one of the three writes, leaving two for its operations
+    response = client.post('/batch', headers=bearer(user), json={'requests': [
+        {'method': 'POST', 'path': '/dogs', 'body': {'name': f'Dog {i}'}} for i in range(3)
+    ] + [{'method': 'GET', 'path': '/dogs'}]})
+    assert [result['status'] for result in response.json['results']] == [201, 201, 429, 200]
+
+
+def test_streaming_operations_are_refused(client, make_user):
+    admin = make_user(is_admin=True)
+    response = client.post('/batch', headers=bearer(admin), json={'requests': [
+        {'method': 'GET', 'path': '/events'},
+        {'method': 'GET', 'path': '/export?table=dog'},
+        {'method': 'POST', 'path': '/batch/', 'body': {'requests': []}},
+        {'method': 'GET', 'path': '/dogs?stream=true'},
+        {'method': 'GET', 'path': '/dogs'},
+    ]})
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json['results']] == [400, 400, 400, 400, 200]
+
+
+def test_operations_read_the_writes_before_them(client, make_user):
+    user = make_user()
+    response = client.post('/batch', headers=bearer(user), json={'requests': [
+        {'method': 'PUT', 'path': '/users/me', 'body': {'first_name': 'New'}},
+        {'method': 'GET', 'path': '/users/me'},
+        {'method': 'PUT', 'path': '/users/me', 'body': {'last_name': 'Other'}},
+    ]})
+    assert [result['body']['first_name'] for result in response.json['results']] == ['New', 'New', 'New']
+    assert client.get('/users/me', headers=bearer(user)).json['first_name'] == 'New'
@@ -0,0 +1,17 @@
+from .conftest import bearer
+
+
+def test_bulk_creates_insert_each_group_of_columns_at_once(client, make_user, capture_queries):
+    counts = []
+    for size in (2, 40):
+        user = make_user()
+        items = [{'name': f'plain {i}'} if i % 2 else {'name': f'bred {i}', 'breed': 'Beagle'} for i in range(size)]
+        with capture_queries() as statements:
+            response = client.post('/dogs/bulk', json=items, headers=bearer(user))
+        assert response.status_code == 200
+        # Results stay in the order the items were sent, whatever group inserted them
+        assert [result['data']['name'] for result in response.json['results']] == [item['name'] for item in items]
+        assert len({result['data']['dog_id'] for result in response.json['results']}) == size
+        counts.append(len(statements))
+        assert sum(statement.startswith('INSERT INTO dog ') for statement, _ in statements) == 2
+    assert counts[0] == counts[1]
@@ -0,0 +1,32 @@
+from .conftest import bearer
+
+
+def test_single_rows_send_last_modified(client, make_user):
+    user = make_user()
+    dog = client.post('/dogs', json={'name': 'Rex'}, headers=bearer(user)).json
+    response = client.get(f'/dogs/{dog["dog_id"]}', headers=bearer(user))
+    assert response.last_modified is not None
+    assert client.get(f'/dogs/{dog["dog_id"]}', headers={
+        **bearer(user), 'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
+
+
+def test_collections_are_revalidated_by_etag_only(client, make_user):
+    user = make_user(rows=2)
+    path = f'/dogs/user/{user.user_id}'
+    response = client.get(path, headers=bearer(user))
+    assert response.headers.get('Last-Modified') is None
+    etag = response.headers['ETag']
+    assert client.get(path, headers={**bearer(user), 'If-None-Match': etag}).status_code == 304
+
+    # Removing a row leaves the newest updated_at of the rest where it was
+    client.delete(f'/dogs/{response.json[0]["dog_id"]}', headers=bearer(user))
+    response = client.get(path, headers={**bearer(user), 'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+    assert response.status_code == 200
+    assert len(response.json) == 1
+
+
+def test_own_profile_sends_no_last_modified(client, make_user):
+    user = make_user(rows=1)
+    response = client.get('/users/me', headers=bearer(user))
+    assert response.headers.get('Last-Modified') is None
+    assert response.headers.get('ETag')
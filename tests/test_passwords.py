@@ -0,0 +1,20 @@
+import pytest
+from werkzeug.security import generate_password_hash
+from app.passwords import needs_rehash
+
+
+@pytest.mark.parametrize('configured, used, rehash', [
+    ('scrypt', 'scrypt:32768:8:1', False),
+    ('scrypt:32768:8:1', 'scrypt', False),
+    ('pbkdf2:sha256', 'pbkdf2', False),
+    ('pbkdf2:sha256:600000', 'pbkdf2:sha256', False),
+    ('pbkdf2:sha256:1000', 'pbkdf2:sha256:1000', False),
+    ('scrypt', 'scrypt:16384:8:1', True),
+    ('pbkdf2:sha256:1000', 'pbkdf2:sha256:2000', True),
+    ('scrypt', 'pbkdf2:sha256:1000', True),
+])
+def test_equivalent_methods_need_no_rehash(app, configured, used, rehash):
+    app.config['PASSWORD_HASH_METHOD'] = configured
+    with app.app_context():
+        assert needs_rehash(generate_password_hash('password', used)) is rehash
+
@@ -0,0 +1,38 @@
+"""The number of statements behind the user endpoints must not grow with the data they return."""
+from .conftest import basic, bearer
+
+
+def test_users_list_runs_a_fixed_number_of_queries(client, make_user, capture_queries):
+    counts = []
+    for users in (2, 20):
+        for _ in range(users):
+            make_user(rows=3)
+        with capture_queries() as statements:
+            response = client.get('/users')
+        assert response.status_code == 200
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
+
+
+def test_own_profile_runs_a_fixed_number_of_queries(client, make_user, capture_queries):
+    counts = []
+    for rows in (1, 25):
+        user = make_user(rows=rows)
+        with capture_queries() as statements:
+            response = client.get('/users/me', headers=bearer(user))
+        assert response.status_code == 200
+        assert len(response.json['dogs']) == rows
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
+
+
+def test_login_runs_a_fixed_number_of_queries(client, make_user, capture_queries):
+    counts = []
+    for rows in (1, 25):
+        user = make_user(rows=rows)
+        with capture_queries() as statements:
+            response = client.get('/login', headers=basic(user))
+        assert response.status_code == 200
+        assert len(response.json['images']) == rows
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
@@ -0,0 +1,68 @@
+"""The lookups behind the per-owner endpoints and login must be answered from an index.
+
+Runs against SQLite, and against PostgreSQL as well when TEST_POSTGRES_URL names
+a database these tests may create and drop tables in.
+"""
+import os
+import re
+
+import pytest
+from app import db
+from .conftest import basic, bearer
+
+
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def database_url(request, tmp_path):
+    if request.param == 'sqlite':
+        return f'sqlite:///{tmp_path / "test.db"}'
+    if not POSTGRES_URL:
+        pytest.skip('TEST_POSTGRES_URL is not set')
+    return POSTGRES_URL
+
+
+def query_plan(app, statement, parameters):
+    with app.app_context():
+        with db.engine.connect() as connection:
+            if connection.dialect.name == 'postgresql':
+                # Tables this small are cheaper to scan, so make the planner show whether it could use an index
+                connection.exec_driver_sql('SET enable_seqscan = off')
+                rows = connection.exec_driver_sql('EXPLAIN ' + statement, parameters).all()
+                return '\n'.join(row[0] for row in rows)
+            rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+            return '\n'.join(row[-1] for row in rows)
+
+
+def assert_uses_index(app, statements, table, pattern):
+    matching = [(statement, parameters) for statement, parameters in statements if re.search(pattern, statement)]
+    assert matching, f'no statement matched {pattern!r}'
+    for statement, parameters in matching:
+        plan = query_plan(app, statement, parameters)
+        if db.engine.dialect.name == 'postgresql':
+            assert f'Seq Scan on {table}' not in plan and 'Index' in plan, plan
+        else:
+            assert re.search(rf'SEARCH "?{table}"? USING (COVERING )?INDEX', plan), plan
+
+
+@pytest.mark.parametrize('path, table, pattern', [
+    ('/dogs/user/{user_id}', 'dog', r'dog\.user_id = '),
+    ('/images/client/{user_id}', 'image', r'image\.client_user_id = '),
+])
+def test_owner_lookups_use_an_index(app, client, make_user, capture_queries, path, table, pattern):
+    user = make_user(rows=3)
+    with capture_queries() as statements:
+        response = client.get(path.format(user_id=user.user_id), headers=bearer(user))
+    assert response.status_code in (200, 404)
+    with app.app_context():
+        assert_uses_index(app, statements, table, pattern)
+
+
+def test_login_email_lookup_uses_an_index(app, client, make_user, capture_queries):
+    user = make_user()
+    with capture_queries() as statements:
+        response = client.get('/login', headers=basic(user))
+    assert response.status_code == 200
+    with app.app_context():
+        assert_uses_index(app, statements, 'user', r'user"?\.email = ')
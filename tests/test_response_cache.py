@@ -0,0 +1,36 @@
+import pytest
+from app import db
+from .conftest import bearer
+
+
+@pytest.fixture
+def config(tmp_path):
+    # An empty replica stands in for one that has not caught up with the primary yet
+    return {
+        'RESPONSE_CACHE_ENABLED': True,
+        'SQLALCHEMY_BINDS': {'replica0': f'sqlite:///{tmp_path / "replica.db"}'},
+        'DB_REPLICA_STICKY_SECONDS': 0,
+    }
+
+
+@pytest.fixture
+def replica(app):
+    with app.app_context():
+        db.metadata.create_all(db.engines['replica0'])
+
+
+def test_cached_views_are_filled_from_the_primary(app, client, make_user, replica):
+    user = make_user()
+    client.post('/dogs', json={'name': 'Rex'}, headers=bearer(user))
+
+    for _ in range(2):
+        response = client.get('/dogs')
+        assert [dog['name'] for dog in response.json] == ['Rex']
+    assert client.get(f'/users/{user.user_id}').json['dogs'][0]['name'] == 'Rex'
+
+
+def test_uncached_read_only_views_still_use_the_replica(app, client, make_user, replica):
+    user = make_user()
+    client.post('/dogs', json={'name': 'Rex'}, headers=bearer(user))
+    # Not cached, so a lagging replica only costs this one response
+    assert client.get(f'/dogs/user/{user.user_id}', headers=bearer(user)).status_code == 404
@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import event
+from app import db
+from .conftest import bearer
+
+
+REPLICAS = ('replica0', 'replica1')
+
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        'SQLALCHEMY_BINDS': {key: f'sqlite:///{tmp_path / f"{key}.db"}' for key in REPLICAS},
+        'DB_REPLICA_STICKY_SECONDS': 0,
+    }
+
+
+@pytest.fixture
+def replica_reads(app):
+    """Record the replicas each statement ran on."""
+    reads = []
+    with app.app_context():
+        engines = {key: db.engines[key] for key in REPLICAS}
+    listeners = {key: lambda *args, key=key: reads.append(key) for key in REPLICAS}
+    for key, engine in engines.items():
+        # Empty copies of the schema are enough to see where the reads go
+        db.metadata.create_all(engine)
+        event.listen(engine, 'before_cursor_execute', listeners[key])
+    yield reads
+    for key, engine in engines.items():
+        event.remove(engine, 'before_cursor_execute', listeners[key])
+
+
+def test_each_request_reads_from_one_replica(client, make_user, replica_reads):
+    user = make_user()
+    used = set()
+    for _ in range(20):
+        replica_reads.clear()
+        client.get('/users/me', headers=bearer(user))
+        assert len(replica_reads) > 1 and len(set(replica_reads)) == 1
+        used.update(replica_reads)
+    assert used == set(REPLICAS)
@@ -0,0 +1,36 @@
+"""A server process must start quickly and without the modules only the ``flask`` command line needs."""
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.startup import CLI_ONLY_MODULES
+
+
+# Typically about half a second; the slack absorbs slow CI machines, not new heavy imports
+STARTUP_BUDGET_MS = 2000
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+app.create_app()
+print(json.dumps({'ms': (time.perf_counter() - start) * 1000, 'modules': sorted(sys.modules)}))
+'''
+
+
+def start_server_process():
+    env = {**os.environ, 'DATABASE_URL': 'sqlite://'}
+    output = subprocess.run([sys.executable, '-c', PROBE], env=env, check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    return json.loads(output)
+
+
+def test_create_app_is_within_budget():
+    # The fastest of a few runs, so one slow start on a busy machine does not fail the test
+    assert min(start_server_process()['ms'] for _ in range(3)) < STARTUP_BUDGET_MS
+
+
+def test_create_app_loads_no_command_line_modules():
+    modules = start_server_process()['modules']
+    assert not [name for name in CLI_ONLY_MODULES if name in modules]
@@ -0,0 +1,59 @@
+"""/sync must never serve a change after one numbered before it that is still uncommitted.
+
+PostgreSQL only, since SQLite lets one transaction write at a time: runs when
+TEST_POSTGRES_URL names a database these tests may create and drop tables in.
+"""
+import os
+
+import pytest
+from app import db
+from app.models import Dog
+from app.sync import record_changes
+from .conftest import bearer
+
+
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+
+@pytest.fixture
+def database_url():
+    if not POSTGRES_URL:
+        pytest.skip('TEST_POSTGRES_URL is not set')
+    return POSTGRES_URL
+
+
+@pytest.fixture
+def open_transaction(app):
+    """Log changes on connections of their own, left uncommitted until the test commits them."""
+    connections = []
+
+    def log_change(user_id):
+        with app.app_context():
+            connection = db.engine.connect()
+        # Writers must not wait for each other; fail instead of hanging if they do
+        connection.exec_driver_sql("SET lock_timeout = '1s'")
+        connection.begin()
+        record_changes(connection, Dog, [(0, user_id)])
+        connections.append(connection)
+        return connection
+    yield log_change
+    for connection in connections:
+        connection.close()
+
+
+def test_changes_wait_for_earlier_uncommitted_ones(client, make_user, open_transaction):
+    admin = make_user(is_admin=True)
+    earlier = open_transaction(admin.user_id)
+    concurrent = open_transaction(admin.user_id)
+    dog_id = client.post('/dogs', json={'name': 'Rex'}, headers=bearer(admin)).json['dog_id']
+
+    body = client.get('/sync', headers=bearer(admin)).json
+    assert body['cursor'] == 0 and body['changes']['dog'] == []
+
+    concurrent.commit()
+    assert client.get('/sync', headers=bearer(admin)).json['cursor'] == 0
+
+    earlier.commit()
+    body = client.get('/sync', headers=bearer(admin)).json
+    assert body['cursor'] > 0
+    assert [dog['dog_id'] for dog in body['changes']['dog']] == [dog_id]
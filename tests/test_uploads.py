@@ -0,0 +1,54 @@
+import io
+import os
+
+import pytest
+from PIL import Image as Picture
+from .conftest import bearer
+
+
+def image_file(format):
+    buffer = io.BytesIO()
+    Picture.new('RGB', (8, 8), 'tan').save(buffer, format)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def upload(app, client, make_user):
+    user = make_user()
+
+    def upload(data, mimetype):
+        response = client.post('/images/upload', headers=bearer(user), content_type='multipart/form-data',
+                               data={'image': (io.BytesIO(data), 'photo', mimetype)})
+        # Let the variants finish before the test's database goes away
+        executor = app.extensions.get('image_variants')
+        if executor is not None:
+            executor.shutdown(wait=True)
+            del app.extensions['image_variants']
+        return response
+    return upload
+
+
+def test_valid_images_are_stored(client, upload):
+    response = upload(image_file('PNG'), 'image/png')
+    assert response.status_code == 201
+    assert client.get(response.json['image_url']).status_code == 200
+
+
+@pytest.mark.parametrize('data, mimetype', [
+    (b'<?php echo "not an image"; ?>', 'image/jpeg'),
+    (image_file('PNG')[:40], 'image/png'),
+    (image_file('JPEG'), 'image/png'),
+], ids=['script', 'truncated', 'mislabelled'])
+def test_files_that_are_not_the_declared_image_type_are_refused(app, upload, data, mimetype):
+    response = upload(data, mimetype)
+    assert response.status_code == 400
+    stored = [name for name in os.listdir(app.config['UPLOAD_FOLDER']) if name != 'tmp']
+    assert stored == []
+
+
+def test_staged_uploads_are_not_served(app, client):
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'tmp'), exist_ok=True)
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], 'tmp', 'staged'), 'wb') as staged:
+        staged.write(b'partial upload')
+    assert client.get('/media/tmp/staged').status_code == 404
+    assert client.get('/media/ab/../tmp/staged').status_code == 404
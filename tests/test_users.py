@@ -0,0 +1,21 @@
+import pytest
+from .conftest import bearer
+
+
+CREDENTIALS = {'token', 'token_expiration', 'password'}
+
+
+@pytest.mark.parametrize('path', ['/users', '/users?stream=true', '/users/{user_id}'])
+def test_other_users_credentials_are_never_returned(client, make_user, path):
+    user = make_user(rows=1)
+    body = client.get(path.format(user_id=user.user_id)).json
+    for row in body if isinstance(body, list) else [body]:
+        assert not CREDENTIALS & row.keys()
+    assert client.get('/users?fields=first_name,token').status_code == 400
+
+
+def test_own_profile_includes_the_token(client, make_user):
+    user = make_user()
+    assert client.get('/users/me', headers=bearer(user)).json['token'] == user.token
+    response = client.get('/users/me?fields=token', headers=bearer(user))
+    assert response.json == {'user_id': user.user_id, 'token': user.token}